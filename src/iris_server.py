@@ -16,8 +16,6 @@ src/iris_server.py - 🌸 IRIS AI v2.0 - Она ЖИВАЯ!
 import logging
 import sys
 import os
-import json
-import threading
 import time
 from pathlib import Path
 from flask import Flask, jsonify, request
@@ -121,6 +119,8 @@ class IrisPersonality:
 class IrisBrain:
     """Основной мозг IRIS с LLM"""
     
+    __slots__ = ('ready', 'context', 'memory', 'mood')
+    
     def __init__(self):
         logger.info("[BRAIN] 🔙 Инициализирую рыватив IRIS...")
         self.ready = True
@@ -138,7 +138,7 @@ class IrisBrain:
             'interrupting': interrupting
         }
         
-        logger.info(f"[BRAIN] 🗣️ Обрабатываю: {text[:50]}...")
+        logger.info("[BRAIN] 🗣️ Обрабатываю: %s...", text[:50])
         
         # Сохраняем в память
         self.memory.append({
@@ -177,7 +177,9 @@ class IrisBrain:
             f"💭 Моменточку... {text[:20]}? Да!"
         ]
         
-        response = default_responses[hash(text) % len(default_responses)]
+        # Выбор по первому символу и длине: O(1) вместо hash() по всему тексту
+        seed = (ord(text[0]) ^ len(text)) if text else 0
+        response = default_responses[seed % len(default_responses)]
         iris_context['speaking'] = False
         
         return response
@@ -595,7 +597,7 @@ def message():
         })
     
     except Exception as e:
-        logger.error(f"[АПИ] Ошибка: {e}")
+        logger.error("[АПИ] Ошибка: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -24,28 +24,57 @@ class EventPriority(Enum):
     LOW = 25           # Комментарии
     IGNORE = 0         # Игнорировать
 
+# Таблица прерываний 5×5: _INTERRUPT_TABLE[текущий * 5 + новый] == 1,
+# если новый приоритет выше текущего на 50+ (индексы по возрастанию)
+_PRIOS = (EventPriority.IGNORE, EventPriority.LOW, EventPriority.MEDIUM,
+          EventPriority.HIGH, EventPriority.CRITICAL)
+_PRIO_INDEX = {p: i for i, p in enumerate(_PRIOS)}
+_INTERRUPT_TABLE = bytes(
+    1 if (n.value - c.value) >= 50 else 0 for c in _PRIOS for n in _PRIOS
+)
+
 class SmartContextAnalyzer:
     """Анализирует контекст события"""
     
+    __slots__ = ('cache', 'cache_ttl')
+    
     def __init__(self):
         self.cache = {}
-        self.cache_ttl = 2.0  # 2 секунды
+        self.cache_ttl = 2_000_000_000  # 2 секунды (в наносекундах)
+    
+    def _memo(self, key: tuple, fn):
+        """
+        TTL-кэш результатов analyze_* по ключу из входных значений
+        Вызывающий получает копию: изменения в ней не портят кэш
+        """
+        now = time.monotonic_ns()
+        hit = self.cache.get(key)
+        if hit is not None and now - hit[0] < self.cache_ttl:
+            return dict(hit[1])
+        value = fn()
+        if len(self.cache) > 256:
+            self.cache.clear()
+        self.cache[key] = (now, value)
+        return dict(value)
     
     def analyze_ammo_situation(self, player, event_data: dict) -> Dict:
         """Анализирует ситуацию с боеприпасами"""
         mag = event_data.get('ammo_magazine', 0)
         reserve = event_data.get('ammo_reserve', 0)
-        total = mag + reserve
         weapon = event_data.get('weapon', 'unknown')
         
-        return {
-            'magazine': mag,
-            'reserve': reserve,
-            'total': total,
-            'weapon': weapon,
-            'status': 'critical' if total <= 3 else 'low' if total <= 10 else 'medium',
-            'advice_urgent': total <= 3,
-        }
+        def build():
+            total = mag + reserve
+            return {
+                'magazine': mag,
+                'reserve': reserve,
+                'total': total,
+                'weapon': weapon,
+                'status': 'critical' if total <= 3 else 'low' if total <= 10 else 'medium',
+                'advice_urgent': total <= 3,
+            }
+        
+        return self._memo(('ammo', mag, reserve, weapon), build)
     
     def analyze_health_situation(self, player, event_data: dict) -> Dict:
         """Анализирует ситуацию с здоровьем"""
@@ -53,16 +82,17 @@ class SmartContextAnalyzer:
         armor = player.armor if player else 0
         damage = event_data.get('damage', 0)
         
-        status = 'critical' if hp <= 1 else 'very_low' if hp <= 15 else 'low' if hp <= 30 else 'medium'
+        def build():
+            return {
+                'health': hp,
+                'armor': armor,
+                'damage_taken': damage,
+                'status': 'critical' if hp <= 1 else 'very_low' if hp <= 15 else 'low' if hp <= 30 else 'medium',
+                'is_critical': hp <= 15,
+                'has_armor': armor > 0,
+            }
         
-        return {
-            'health': hp,
-            'armor': armor,
-            'damage_taken': damage,
-            'status': status,
-            'is_critical': hp <= 15,
-            'has_armor': armor > 0,
-        }
+        return self._memo(('health', hp, armor, damage), build)
     
     def analyze_kill_context(self, event_data: dict, player) -> Dict:
         """Анализирует контекст килла"""
@@ -71,30 +101,35 @@ class SmartContextAnalyzer:
         headshot = event_data.get('headshot', False)
         weapon = event_data.get('weapon', 'unknown')
         
-        # Определяем тип килла
-        if kills_this >= 5:
-            kill_type = 'ace'
-        elif kills_this >= 4:
-            kill_type = 'quadra'
-        elif kills_this >= 3:
-            kill_type = 'triple'
-        elif kills_this >= 2:
-            kill_type = 'double'
-        else:
-            kill_type = 'single'
+        def build():
+            # Определяем тип килла
+            if kills_this >= 5:
+                kill_type = 'ace'
+            elif kills_this >= 4:
+                kill_type = 'quadra'
+            elif kills_this >= 3:
+                kill_type = 'triple'
+            elif kills_this >= 2:
+                kill_type = 'double'
+            else:
+                kill_type = 'single'
+            
+            return {
+                'round_kills': kills_this,
+                'kill_streak': streak,
+                'headshot': headshot,
+                'weapon': weapon,
+                'kill_type': kill_type,
+                'is_special': kill_type in ['triple', 'quadra', 'ace'],
+            }
         
-        return {
-            'round_kills': kills_this,
-            'kill_streak': streak,
-            'headshot': headshot,
-            'weapon': weapon,
-            'kill_type': kill_type,
-            'is_special': kill_type in ['triple', 'quadra', 'ace'],
-        }
+        return self._memo(('kill', kills_this, streak, headshot, weapon), build)
 
 class EventPriorityManager:
     """Управляет приоритетами событий"""
     
+    __slots__ = ('event_weights',)
+    
     def __init__(self):
         self.event_weights = {
             'low_health': (EventPriority.CRITICAL, "Здоровье критичное"),
@@ -127,15 +162,17 @@ class EventPriorityManager:
     def should_interrupt(self, current_priority: EventPriority, new_priority: EventPriority) -> bool:
         """Должен ли новый event прервать текущий?"""
         # Прерываем если разница в приоритете >= 50
-        return (new_priority.value - current_priority.value) >= 50
+        return _INTERRUPT_TABLE[_PRIO_INDEX[current_priority] * 5 + _PRIO_INDEX[new_priority]] == 1
 
 class PlayerStateTracker:
     """Отслеживает состояние игрока"""
     
+    __slots__ = ('current_state', 'last_hp', 'last_state_change')
+    
     def __init__(self):
         self.current_state = PlayerState.UNKNOWN
         self.last_hp = 100
-        self.last_state_change = time.time()
+        self.last_state_change = time.monotonic_ns()
     
     def update(self, player_alive: bool, is_spectating: bool, round_phase: str = ""):
         """Обновляет состояние игрока"""
@@ -151,7 +188,7 @@ class PlayerStateTracker:
             self.current_state = PlayerState.PLAYING
         
         if old_state != self.current_state:
-            self.last_state_change = time.time()
+            self.last_state_change = time.monotonic_ns()
     
     def is_in_game(self) -> bool:
         """Активно ли в игре?"""
@@ -164,26 +201,31 @@ class PlayerStateTracker:
 class EventInterruptHandler:
     """Управляет прерыванием текущих событий"""
     
+    __slots__ = ('current_event', 'current_priority', '_priority_row', 'speaking_lock')
+    
     def __init__(self):
         self.current_event = None
         self.current_priority = EventPriority.LOW
+        self._priority_row = _PRIO_INDEX[EventPriority.LOW] * 5
         self.speaking_lock = threading.Lock()
     
     def can_interrupt(self, new_priority: EventPriority) -> bool:
         """Может ли новое событие прервать текущее?"""
-        return (new_priority.value - self.current_priority.value) >= 50
+        return _INTERRUPT_TABLE[self._priority_row + _PRIO_INDEX[new_priority]] == 1
     
     def set_current_event(self, event_type: str, priority: EventPriority):
         """Установить текущее событие"""
         with self.speaking_lock:
             self.current_event = event_type
             self.current_priority = priority
+            self._priority_row = _PRIO_INDEX[priority] * 5
     
     def clear_current_event(self):
         """Очистить текущее событие"""
         with self.speaking_lock:
             self.current_event = None
             self.current_priority = EventPriority.LOW
+            self._priority_row = _PRIO_INDEX[EventPriority.LOW] * 5
 
 # ════════════════════════════════════════════════════════════
 
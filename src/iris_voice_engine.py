@@ -7,15 +7,23 @@ IRIS VOICE ENGINE - Живой аудиовызов
 """
 
 import os
+import re
 import sys
 import threading
 import queue
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Optional, Callable, Dict, Any
 from datetime import datetime
 import json
 
+# Быстрый парсер для результатов Vosk (C-расширение); stdlib как запасной
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 try:
     import pyaudio
     import wave
@@ -26,6 +34,21 @@ except ImportError:
     wave = None
     np = None
 
+try:
+    import sounddevice as sd
+except ImportError:
+    sd = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 try:
     import pyttsx3
 except ImportError:
@@ -36,8 +59,8 @@ try:
     from vosk import Model, KaldiRecognizer
 except ImportError:
     print("Установите: pip install vosk")
-    from vosk import None as vosk_unavailable
-    vosk_unavailable = True
+    Model = None
+    KaldiRecognizer = None
 
 # ===================== НАСТРОЙКА ЛОГИРОВАНИЯ =====================
 logging.basicConfig(
@@ -51,16 +74,125 @@ logging.basicConfig(
 logger = logging.getLogger('IrisVoiceEngine')
 
 
+# ===================== ПРИВЯЗКА ПОТОКОВ К ЯДРАМ =====================
+# ASR - ядро 0, TTS - ядро 1, обработка - ядро 2, пул LLM - остальные
+ASR_CORE = 0
+TTS_CORE = 1
+PROCESSING_CORE = 2
+
+
+def _pin(cores, boost: bool = False):
+    """Привязать текущий поток к ядрам (Linux) и при boost поднять приоритет.
+    
+    На других ОС и без прав тихо ничего не делает.
+    """
+    available = set(range(os.cpu_count() or 1))
+    cores = set(cores) & available
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError):
+            pass
+    if boost:
+        try:
+            os.nice(-5)
+        except (AttributeError, OSError):
+            pass
+
+
+def _pin_llm_worker():
+    """Инициализатор пула LLM: все ядра, кроме занятых ASR/TTS/обработкой"""
+    _pin(range(PROCESSING_CORE + 1, os.cpu_count() or 1))
+
+
+# ===================== ПОИСК КЛЮЧЕВЫХ СЛОВ =====================
+class KeywordMatcher:
+    """Поиск набора подстрок за один проход (Aho-Corasick, если есть pyahocorasick)"""
+    
+    def __init__(self, words):
+        self.words = tuple(words)
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for word in self.words:
+                self._automaton.add_word(word, word)
+            self._automaton.make_automaton()
+    
+    def find_all(self, text: str) -> list:
+        """Все найденные слова в порядке появления в тексте"""
+        if self._automaton is not None:
+            return [word for _, word in self._automaton.iter(text)]
+        # Без автомата - в порядке первого вхождения в текст
+        positions = ((text.find(word), word) for word in self.words)
+        return [word for pos, word in sorted(p for p in positions if p[0] >= 0)]
+    
+    def contains_any(self, text: str) -> bool:
+        """Есть ли в тексте хотя бы одно слово"""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return any(word in text for word in self.words)
+
+
+# ===================== VAD (энергетический гейт) =====================
+if njit is not None:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _vad(x, thresh):
+        """Средняя энергия int16-блока выше порога?"""
+        n = x.shape[0]
+        if n == 0:
+            return False
+        s = 0.0
+        for i in range(n):
+            v = float(x[i])
+            s += v * v
+        return (s / n) > thresh
+else:
+    def _vad(x, thresh):
+        """Средняя энергия int16-блока выше порога? (без numba)"""
+        if x.shape[0] == 0:
+            return False
+        xf = x.astype(np.float64)
+        return float(np.dot(xf, xf)) / x.shape[0] > thresh
+
+
 # ===================== ГОЛОСОВОЕ РАСПОЗНАВАНИЕ =====================
 class VoiceRecognizer:
-    """Распознавание речи в реальном времени (Vosk + русский)"""
+    """Распознавание речи в реальном времени (Vosk + русский)
+    
+    Переменные окружения:
+        VOSK_MODEL_RU: путь к основной (большой) модели, по умолчанию 'model_ru'
+        VOSK_MODEL_QUANT: если задана - сначала пробуем малую модель
+            (VOSK_MODEL_RU_SMALL, по умолчанию 'model_ru_small'): в разы быстрее
+            при небольшой потере точности. Нет малой модели - берём основную.
+    """
+    
+    # Порог средней энергии int16 (~RMS 300) и сколько тихих блоков после речи
+    # ещё отдаём в Vosk, чтобы он увидел паузу и закрыл фразу
+    VAD_THRESHOLD = 300.0 ** 2
+    VAD_HANGOVER_BLOCKS = 2
     
-    def __init__(self, model_path: str = None):
+    # Словарь грамматики Vosk: декодер ищет только среди этих фраз
+    GRAMMAR_WORDS = [
+        "убийство", "смерть", "раунд", "карта", "экономика",
+        "стратегия", "позиция", "враг", "команда", "бомба",
+        "привет", "как дела", "спасибо", "ирис", "ириска", "[unk]"
+    ]
+    
+    WAKE_WORDS = ("ирис", "ириска")
+    
+    def __init__(self, model_path: str = None, use_sounddevice: bool = True,
+                 use_grammar: bool = True):
         """Инициализация распознавателя"""
         self.model_path = model_path or os.getenv('VOSK_MODEL_RU', 'model_ru')
         self.model = None
+        self.use_sounddevice = use_sounddevice and sd is not None
+        self.use_grammar = use_grammar
+        self._silent_blocks = self.VAD_HANGOVER_BLOCKS
         self.is_listening = False
+        self.wake_detected = False  # wake-слово замечено в частичном результате
+        self._wake_matcher = KeywordMatcher(self.WAKE_WORDS)
         self.recognizer = None
+        self._recognizer_lock = threading.Lock()
         self.audio_interface = None
         
         self._init_model()
@@ -68,6 +200,13 @@ class VoiceRecognizer:
     def _init_model(self):
         """Инициализация модели Vosk"""
         try:
+            if os.getenv('VOSK_MODEL_QUANT'):
+                small_path = os.getenv('VOSK_MODEL_RU_SMALL', 'model_ru_small')
+                if os.path.exists(small_path):
+                    self.model_path = small_path
+                else:
+                    logger.warning(f"Малая модель не найдена: {small_path}, используется {self.model_path}")
+            
             if not os.path.exists(self.model_path):
                 logger.warning(f"Модель не найдена: {self.model_path}")
                 logger.info("Используется эмуляция распознавания")
@@ -77,14 +216,24 @@ class VoiceRecognizer:
             from vosk import Model, KaldiRecognizer
             self.model = Model(self.model_path)
             logger.info(f"Модель загружена: {self.model_path}")
+            
+            # Распознаватель строим один раз и переиспользуем между сессиями
+            if self.use_grammar:
+                # Грамматика сужает поиск FST - распознавание в разы быстрее
+                grammar = json.dumps(self.GRAMMAR_WORDS, ensure_ascii=False)
+                self.recognizer = KaldiRecognizer(self.model, 16000, grammar)
+            else:
+                self.recognizer = KaldiRecognizer(self.model, 16000)
+            self.recognizer.SetWords(True)
         except Exception as e:
             logger.error(f"Ошибка загрузки модели: {e}")
             logger.info("Используется эмуляция распознавания")
             self.model = None
+            self.recognizer = None
     
     def start_listening(self, on_text: Callable[[str], None]) -> threading.Thread:
         """Запуск слушания микрофона"""
-        if not pyaudio:
+        if not pyaudio and not self.use_sounddevice:
             logger.error("PyAudio недоступен")
             return None
         
@@ -99,47 +248,100 @@ class VoiceRecognizer:
     
     def _listen_loop(self, on_text: Callable[[str], None]):
         """Основной цикл слушания"""
+        _pin((ASR_CORE,), boost=True)
+        if self.recognizer is None:
+            logger.error("Распознаватель Vosk не инициализирован")
+            return
+        
         try:
-            p = pyaudio.PyAudio()
-            stream = p.open(
-                format=pyaudio.paFloat32,
-                channels=1,
-                rate=16000,
-                input=True,
-                frames_per_buffer=4096
-            )
-            
-            from vosk import KaldiRecognizer
-            rec = KaldiRecognizer(self.model, 16000)
-            rec.SetWords([
-                "убийство", "смерть", "раунд", "карта", "экономика",
-                "стратегия", "позиция", "враг", "команда", "бомба",
-                "привет", "как дела", "спасибо", "ирис", "ириска"
-            ])
-            
-            logger.info("Слушание активно...")
+            # Одна сессия за раз: повторный старт ждёт, пока отпустят распознаватель
+            with self._recognizer_lock:
+                rec = self.recognizer
+                rec.Reset()
+                
+                logger.info("Слушание активно...")
+                
+                if self.use_sounddevice:
+                    self._listen_sounddevice(rec, on_text)
+                else:
+                    self._listen_pyaudio(rec, on_text)
             
+        except Exception as e:
+            logger.error(f"Ошибка в цикле слушания: {e}")
+    
+    def _listen_sounddevice(self, rec, on_text: Callable[[str], None]):
+        """Захват через sounddevice: C-колбэк складывает блоки в очередь"""
+        audio_q = queue.SimpleQueue()
+        
+        def callback(indata, frames, time_info, status):
+            # Vosk (cffi) принимает только bytes; indata - буфер PortAudio,
+            # который переиспользуется после возврата, поэтому копируем
+            audio_q.put(bytes(indata))
+        
+        # Vosk принимает 16-bit PCM: блоки int16 по 0.5 с
+        with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype='int16',
+                               channels=1, callback=callback):
             while self.is_listening:
                 try:
-                    data = stream.read(4096, exception_on_overflow=False)
-                    
-                    if rec.AcceptWaveform(data):
-                        result = json.loads(rec.Result())
-                        if 'result' in result:
-                            text = ' '.join([item['conf'] for item in result['result']])
-                            if text and len(text.strip()) > 0:
-                                logger.debug(f"Распознано: {text}")
-                                on_text(text)
+                    data = audio_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self._feed(rec, data, on_text)
+    
+    def _listen_pyaudio(self, rec, on_text: Callable[[str], None]):
+        """Захват через PyAudio (блокирующее чтение) - запасной путь"""
+        p = pyaudio.PyAudio()
+        # Vosk принимает 16-bit PCM: читаем int16 блоками по 0.5 с
+        stream = p.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=16000,
+            input=True,
+            frames_per_buffer=8000
+        )
+        
+        try:
+            while self.is_listening:
+                try:
+                    data = stream.read(8000, exception_on_overflow=False)
                 except Exception as e:
                     logger.error(f"Ошибка обработки аудио: {e}")
                     continue
-            
+                self._feed(rec, data, on_text)
+        finally:
             stream.stop_stream()
             stream.close()
             p.terminate()
+    
+    def _feed(self, rec, data, on_text: Callable[[str], None]):
+        """Передать блок PCM в Vosk и отдать распознанный текст"""
+        try:
+            # Тишину в Vosk не гоняем (кроме короткого хвоста после речи)
+            if np is not None:
+                if _vad(np.frombuffer(data, dtype=np.int16), self.VAD_THRESHOLD):
+                    self._silent_blocks = 0
+                else:
+                    self._silent_blocks += 1
+                    if self._silent_blocks > self.VAD_HANGOVER_BLOCKS:
+                        return
             
+            if rec.AcceptWaveform(data):
+                raw = rec.Result()
+                # Ключ "result" есть только при распознанных словах -
+                # пустые финальные сегменты не парсим
+                if '"result"' in raw:
+                    result = _json.loads(raw)
+                    text = ' '.join(item['word'] for item in result['result'])
+                    if text and len(text.strip()) > 0:
+                        logger.debug(f"Распознано: {text}")
+                        self.wake_detected = False
+                        on_text(text)
+            else:
+                # Частичный результат: только поиск подстроки, без JSON
+                if self._wake_matcher.contains_any(rec.PartialResult()):
+                    self.wake_detected = True
         except Exception as e:
-            logger.error(f"Ошибка в цикле слушания: {e}")
+            logger.error(f"Ошибка обработки аудио: {e}")
     
     def stop_listening(self):
         """Остановка слушания"""
@@ -154,7 +356,13 @@ class VoiceRecognizer:
 
 # ===================== СИНТЕЗ РЕЧИ (TTS) =====================
 class VoiceSynthesizer:
-    """Синтез речи в реальном времени (TTS)"""
+    """Синтез речи в реальном времени (TTS)
+    
+    pyttsx3 не потокобезопасен, поэтому движком владеет один поток:
+    он крутит внешний цикл (startLoop(False) + iterate()) и выполняет
+    команды из очереди. speak()/stop()/shutdown() только ставят команды.
+    Пока говорить нечего, поток спит на очереди команд, а не опрашивает движок.
+    """
     
     def __init__(self, voice_speed: float = 1.0, voice_volume: float = 0.9):
         """Инициализация синтезатора"""
@@ -162,8 +370,29 @@ class VoiceSynthesizer:
         self.voice_speed = voice_speed
         self.voice_volume = voice_volume
         self.is_speaking = False
+        # Установлен, когда движок молчит (фраза договорена или остановлена)
+        self.stopped_event = threading.Event()
+        self.stopped_event.set()
+        
+        self._commands = queue.Queue()
+        self._pending = 0  # фраз отдано движку и не договорено (только поток движка)
+        self._engine_ready = threading.Event()
+        self._engine_thread = None
+        self.start()
+    
+    def start(self):
+        """Запуск потока движка (после shutdown() - заново)"""
+        if self._engine_thread is not None and self._engine_thread.is_alive():
+            return
         
-        self._init_engine()
+        self._engine_ready.clear()
+        self._engine_thread = threading.Thread(
+            target=self._engine_loop,
+            daemon=True,
+            name="IrisTTSEngine"
+        )
+        self._engine_thread.start()
+        self._engine_ready.wait(timeout=5)
     
     def _init_engine(self):
         """Инициализация TTS движка"""
@@ -186,56 +415,124 @@ class VoiceSynthesizer:
             self.engine.setProperty('rate', int(150 * self.voice_speed))
             self.engine.setProperty('volume', self.voice_volume)
             
+            self.engine.connect('started-utterance', self._on_utterance_started)
+            self.engine.connect('finished-utterance', self._on_utterance_finished)
+            
             logger.info("TTS движок инициализирован")
         except Exception as e:
             logger.error(f"Ошибка инициализации TTS: {e}")
+            self.engine = None
     
-    def speak(self, text: str, interrupting: bool = False) -> bool:
-        """Воспроизведение текста"""
+    def _engine_loop(self):
+        """Поток движка: создаёт движок и выполняет команды очереди"""
+        _pin((TTS_CORE,), boost=True)
+        self._init_engine()
+        self._engine_ready.set()
         if not self.engine:
-            logger.warning(f"[ЭМУЛЯЦИЯ] Говорю: {text}")
-            return True
+            return
         
         try:
-            # Если нужно прерывание - остановить текущую речь
-            if interrupting and self.is_speaking:
-                self.engine.stop()
-                logger.debug("Предыдущая речь прервана")
-            
-            # Очистка от старых очередей
-            self.engine.runAndWait()
+            self.engine.startLoop(False)
+        except Exception as e:
+            logger.error(f"Ошибка запуска цикла TTS: {e}")
+            return
+        
+        self._pending = 0
+        running = True
+        while running:
+            # Без фраз в работе ждём команду; во время речи только забираем готовые
+            try:
+                command = self._commands.get(block=self._pending == 0)
+            except queue.Empty:
+                command = None
             
-            # Произнести текст
-            self.engine.say(text)
-            self.is_speaking = True
-            self.engine.runAndWait()
-            self.is_speaking = False
+            if command is not None:
+                if command[0] == 'shutdown':
+                    running = False
+                self._run_command(command)
+                continue
             
-            logger.debug(f"Произнесено: {text[:50]}...")
-            return True
+            try:
+                self.engine.iterate()
+            except Exception as e:
+                logger.error(f"Ошибка синтеза: {e}")
+            time.sleep(0.01)
+        
+        try:
+            self.engine.endLoop()
         except Exception as e:
-            logger.error(f"Ошибка синтеза: {e}")
+            logger.error(f"Ошибка остановки цикла TTS: {e}")
+        logger.debug("Поток TTS завершён")
+    
+    def _run_command(self, command: tuple):
+        """Выполнить команду в потоке движка"""
+        try:
+            if command[0] == 'say':
+                _, text, interrupting = command
+                # Если нужно прерывание - остановить текущую речь
+                if interrupting and self.is_speaking:
+                    self.engine.stop()
+                    self._pending = 0
+                    logger.debug("Предыдущая речь прервана")
+                self.engine.say(text)
+                self._pending += 1
+            elif command[0] in ('stop', 'shutdown'):
+                self.engine.stop()
+                self._pending = 0
+                self.is_speaking = False
+                self.stopped_event.set()
+                logger.debug("Воспроизведение остановлено")
+        except Exception as e:
+            logger.error(f"Ошибка команды TTS {command[0]}: {e}")
+    
+    def _on_utterance_started(self, name):
+        self.is_speaking = True
+        self.stopped_event.clear()
+    
+    def _on_utterance_finished(self, name, completed):
+        self._pending = max(0, self._pending - 1)
+        self.is_speaking = False
+        self.stopped_event.set()
+        logger.debug("Фраза произнесена")
+    
+    def speak(self, text: str, interrupting: bool = False) -> bool:
+        """Поставить текст в очередь воспроизведения (не блокирует)"""
+        if not self.engine:
+            logger.warning(f"[ЭМУЛЯЦИЯ] Говорю: {text}")
+            return True
+        
+        self._commands.put(('say', text, interrupting))
+        return True
+    
+    _SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+')
+    
+    def speak_stream(self, text: str, interrupting: bool = False) -> bool:
+        """Воспроизведение по предложениям: первое звучит, пока синтезируются следующие"""
+        sentences = [part for part in self._SENTENCE_SPLIT.split(text.strip()) if part]
+        if not sentences:
             return False
+        
+        # Прерывает только первое предложение, остальные встают за ним
+        self.speak(sentences[0], interrupting)
+        for sentence in sentences[1:]:
+            self.speak(sentence)
+        return True
     
     def speak_async(self, text: str, interrupting: bool = False):
-        """Асинхронное воспроизведение"""
-        thread = threading.Thread(
-            target=self.speak,
-            args=(text, interrupting),
-            daemon=True
-        )
-        thread.start()
-        return thread
+        """Асинхронное воспроизведение (speak и так не блокирует)"""
+        return self.speak(text, interrupting)
     
     def stop(self):
         """Остановка воспроизведения"""
         if self.engine:
-            try:
-                self.engine.stop()
-                self.is_speaking = False
-                logger.debug("Воспроизведение остановлено")
-            except Exception as e:
-                logger.error(f"Ошибка остановки: {e}")
+            self._commands.put(('stop',))
+    
+    def shutdown(self):
+        """Остановка речи и завершение потока движка (endLoop)"""
+        thread = self._engine_thread
+        if thread is not None and thread.is_alive():
+            self._commands.put(('shutdown',))
+            thread.join(timeout=2)
 
 
 # ===================== ОСНОВНОЙ ENGINE =====================
@@ -262,23 +559,34 @@ class IrisVoiceEngine:
         self.last_speech_time = 0
         self.interruption_enabled = True
         
-        # Очереди
-        self.input_queue = queue.Queue()
-        self.output_queue = queue.Queue()
+        # LLM вызывается в пуле; новая реплика отменяет устаревший запрос.
+        # llm_cancel_event может проверять сам callback, чтобы прерваться раньше.
+        # Пул создаётся в start() и закрывается в stop()
+        self.llm_timeout = 30.0
+        self.llm_cancel_event = threading.Event()
+        self._llm_pool: Optional[ThreadPoolExecutor] = None
+        self._current_future: Optional[Future] = None
+        self._llm_wake: Optional[threading.Event] = None
+        
+        # Очередь входа (ограничена: при переполнении выбрасываем самое старое).
+        # Ответ LLM уходит в синтезатор сразу из потока обработки
+        self.input_queue = queue.Queue(maxsize=8)
         
         # Потоки
         self.input_thread = None
         self.processing_thread = None
-        self.output_thread = None
         
         # Статистика
         self.stats = {
             'total_inputs': 0,
             'total_outputs': 0,
+            'dropped_inputs': 0,
             'start_time': time.time(),
             'last_input': None,
             'last_output': None
         }
+        self._start_monotonic = time.monotonic()
+        self._stats_cache = (0.0, None)  # (monotonic время расчёта, результат)
         
         logger.info("IrisVoiceEngine инициализирован")
     
@@ -291,6 +599,14 @@ class IrisVoiceEngine:
         self.is_running = True
         logger.info("🎤 Запуск IRIS Voice Engine...")
         
+        # Поток движка TTS завершается в stop() - поднимаем его заново
+        self.synthesizer.start()
+        self._llm_pool = ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix="iris-llm",
+            initializer=_pin_llm_worker
+        )
+        
         # Запуск входящего потока (микрофон)
         if self.enable_voice_input:
             self.input_thread = self.recognizer.start_listening(
@@ -304,14 +620,6 @@ class IrisVoiceEngine:
         )
         self.processing_thread.start()
         
-        # Запуск выхода (синтез)
-        if self.enable_voice_output:
-            self.output_thread = threading.Thread(
-                target=self._output_loop,
-                daemon=True
-            )
-            self.output_thread.start()
-        
         logger.info("✅ Voice Engine запущен")
     
     def stop(self):
@@ -323,15 +631,21 @@ class IrisVoiceEngine:
         
         self.is_running = False
         self.recognizer.stop_listening()
-        self.synthesizer.stop()
+        self.synthesizer.shutdown()
+        self._cancel_llm()
+        
+        # Сентинел будит поток обработки, ждущий на очереди
+        self._put_latest(self.input_queue, None)
         
         # Ждём завершения потоков
         if self.input_thread:
             self.input_thread.join(timeout=2)
         if self.processing_thread:
             self.processing_thread.join(timeout=2)
-        if self.output_thread:
-            self.output_thread.join(timeout=2)
+        
+        # Запросы из очереди пула отменяются, выполняющийся дорабатывает в фоне
+        if self._llm_pool is not None:
+            self._llm_pool.shutdown(wait=False, cancel_futures=True)
         
         logger.info("✅ Voice Engine остановлен")
     
@@ -345,64 +659,96 @@ class IrisVoiceEngine:
         self.stats['total_inputs'] += 1
         self.stats['last_input'] = text
         
+        # Устаревший запрос к LLM больше не нужен
+        self._cancel_llm()
+        
         # Если IRIS говорит - прервать её
         if self.synthesizer.is_speaking and self.interruption_enabled:
             logger.debug("Прерывание речи IRIS...")
             self.synthesizer.stop()
-            time.sleep(0.2)  # Небольшая пауза
+            # Ждём, пока движок реально замолчит (обычно сразу), но не дольше 200 мс
+            self.synthesizer.stopped_event.wait(timeout=0.2)
         
         # Добавить в очередь обработки
-        self.input_queue.put(text)
+        if self._put_latest(self.input_queue, text):
+            self.stats['dropped_inputs'] += 1
+    
+    def _cancel_llm(self):
+        """Отменить незавершённый запрос к LLM"""
+        future = self._current_future
+        if future is not None and not future.done():
+            self.llm_cancel_event.set()
+            future.cancel()
+            if self._llm_wake is not None:
+                self._llm_wake.set()
+    
+    def _run_llm(self, user_text: str) -> Optional[str]:
+        """Вызвать LLM в пуле и дождаться ответа, если его не отменили"""
+        self.llm_cancel_event.clear()
+        wake = threading.Event()
+        self._llm_wake = wake
+        future = self._llm_pool.submit(self.llm_callback, user_text)
+        self._current_future = future
+        future.add_done_callback(lambda _: wake.set())
+        
+        wake.wait(timeout=self.llm_timeout)
+        if self.llm_cancel_event.is_set() or not future.done():
+            future.cancel()
+            logger.debug(f"Ответ LLM отброшен: {user_text[:50]}")
+            return None
+        return future.result()
+    
+    @staticmethod
+    def _put_latest(q: queue.Queue, item) -> bool:
+        """Положить в ограниченную очередь, вытеснив самое старое.
+        
+        Returns:
+            True если пришлось выбросить элемент
+        """
+        dropped = False
+        while True:
+            try:
+                q.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    dropped = True
+                except queue.Empty:
+                    pass
     
     def _processing_loop(self):
         """Основной цикл обработки"""
+        _pin((PROCESSING_CORE,))
         while self.is_running:
             try:
-                # Получить входящий текст
-                try:
-                    user_text = self.input_queue.get(timeout=0.5)
-                except queue.Empty:
-                    continue
+                # Получить входящий текст (None - сигнал остановки)
+                user_text = self.input_queue.get()
+                if user_text is None:
+                    break
                 
                 # Вызвать LLM callback
                 if self.llm_callback:
                     logger.debug(f"Отправка в LLM: {user_text}")
-                    iris_response = self.llm_callback(user_text)
+                    iris_response = self._run_llm(user_text)
                     
                     if iris_response:
                         logger.info(f"🌸 IRIS: {iris_response}")
                         self.stats['total_outputs'] += 1
                         self.stats['last_output'] = iris_response
                         
-                        # Добавить в выходную очередь
-                        self.output_queue.put(iris_response)
+                        # Синтезировать речь (speak не блокирует)
+                        if self.enable_voice_output:
+                            # Прерывание если пользователь начал говорить
+                            self.synthesizer.speak_stream(
+                                iris_response,
+                                interrupting=self.interruption_enabled
+                            )
+                            self.last_speech_time = time.time()
                 
             except Exception as e:
                 logger.error(f"Ошибка в цикле обработки: {e}")
     
-    def _output_loop(self):
-        """Цикл синтеза речи"""
-        while self.is_running:
-            try:
-                # Получить ответ
-                try:
-                    response = self.output_queue.get(timeout=0.5)
-                except queue.Empty:
-                    continue
-                
-                # Синтезировать речь
-                if response and self.enable_voice_output:
-                    # Прерывание если пользователь начал говорить
-                    self.synthesizer.speak(
-                        response,
-                        interrupting=self.interruption_enabled
-                    )
-                    
-                    self.last_speech_time = time.time()
-                
-            except Exception as e:
-                logger.error(f"Ошибка в цикле выхода: {e}")
-    
     def send_text(self, text: str, force: bool = False):
         """Отправить текст для обработки"""
         if not self.is_running and not force:
@@ -419,9 +765,14 @@ class IrisVoiceEngine:
             logger.info(f"[NO AUDIO] IRIS: {text}")
     
     def get_stats(self) -> Dict[str, Any]:
-        """Получить статистику"""
-        uptime = time.time() - self.stats['start_time']
-        return {
+        """Получить статистику (кэшируется на 1 с для частого опроса из UI; вызывающий получает копию)"""
+        now = time.monotonic()
+        cached_at, cached = self._stats_cache
+        if cached is not None and now - cached_at < 1.0:
+            return dict(cached)
+        
+        uptime = now - self._start_monotonic
+        result = {
             **self.stats,
             'uptime': uptime,
             'is_running': self.is_running,
@@ -429,6 +780,8 @@ class IrisVoiceEngine:
             'outputs_per_minute': self.stats['total_outputs'] / (uptime / 60) if uptime > 0 else 0,
             'is_iris_speaking': self.synthesizer.is_speaking
         }
+        self._stats_cache = (now, result)
+        return result.copy()
 
 
 # ===================== ПРИМЕР ИСПОЛЬЗОВАНИЯ =====================
@@ -436,18 +789,18 @@ if __name__ == "__main__":
     print("=== IRIS VOICE ENGINE TEST ===")
     
     # Простой LLM callback для тестирования
+    responses = {
+        'привет': 'Привет! Как дела?',
+        'как дела': 'Отлично! Спасибо за вопрос!',
+        'ирис': 'Я здесь! Слушаю тебя.',
+        'помощь': 'Я помогу! О чём тебе рассказать?'
+    }
+    response_matcher = KeywordMatcher(responses)
+    
     def simple_llm(text: str) -> str:
-        responses = {
-            'привет': 'Привет! Как дела?',
-            'как дела': 'Отлично! Спасибо за вопрос!',
-            'ирис': 'Я здесь! Слушаю тебя.',
-            'помощь': 'Я помогу! О чём тебе рассказать?'
-        }
-        
-        text_lower = text.lower()
-        for key, value in responses.items():
-            if key in text_lower:
-                return value
+        hits = response_matcher.find_all(text.lower())
+        if hits:
+            return responses[hits[0]]
         
         return f"Ты сказал: {text}. Интересно!"
     
@@ -2,15 +2,29 @@
 # 🎯 TTS QUEUE MANAGER - Управление очередью с приоритетами и без спама
 # ════════════════════════════════════════════════════════════════════════════════════
 
+import heapq
+import itertools
+import queue
 import threading
 import time
 import logging
-from collections import deque
 from typing import Optional, Dict
 
 logger = logging.getLogger("IRIS")
 
 
+class _TTSItem:
+    """Элемент очереди TTS (__slots__ вместо dict - втрое меньше памяти)"""
+    
+    __slots__ = ('text', 'emotion', 'priority', 'timestamp')
+    
+    def __init__(self, text: str, emotion: str, priority: int, timestamp: float):
+        self.text = text
+        self.emotion = emotion
+        self.priority = priority
+        self.timestamp = timestamp
+
+
 class TTSQueueManager:
     """
     Менеджер очереди TTS с приоритетами и дебаунсером
@@ -36,11 +50,15 @@ class TTSQueueManager:
             max_queue_size: Максимальный размер очереди (8 по умолчанию)
         """
         self.tts = tts_engine
-        self.queue: deque = deque(maxlen=max_queue_size)
+        # Элементы (-priority, counter, timestamp, item): get отдаёт наивысший приоритет,
+        # при равном приоритете - самый ранний (counter монотонно растёт).
+        # PriorityQueue потокобезопасна сама - отдельный lock не нужен
+        self.queue = queue.PriorityQueue(maxsize=max_queue_size)
+        self._counter = itertools.count()
+        self.max_queue_size = max_queue_size
         self.last_speak_time = 0.0
         self.debounce_interval = 0.3  # 300мс между озвучками
         self.is_speaking = False
-        self.lock = threading.Lock()
         self.processor_thread: Optional[threading.Thread] = None
         self.is_running = False
         
@@ -59,25 +77,23 @@ class TTSQueueManager:
         if priority is None:
             priority = self.PRIORITY_REGULAR
         
-        with self.lock:
-            if len(self.queue) >= self.queue.maxlen:
-                logger.warning(f"[TTS] Очередь переполнена ({len(self.queue)} элементов)")
-                return False
-            
-            self.queue.append({
-                'text': text.strip(),
-                'emotion': emotion,
-                'priority': priority,
-                'timestamp': time.time()
-            })
-            logger.debug(f"[TTS] Добавлено: {text[:60]} (приоритет {priority})")
-            return True
+        timestamp = time.time()
+        try:
+            self.queue.put_nowait((-priority, next(self._counter), timestamp,
+                                   _TTSItem(text.strip(), emotion, priority, timestamp)))
+        except queue.Full:
+            logger.warning(f"[TTS] Очередь переполнена ({self.queue.qsize()} элементов)")
+            return False
+        
+        logger.debug(f"[TTS] Добавлено: {text[:60]} (приоритет {priority})")
+        return True
     
     def start(self):
         """Запустить обработчик очереди в отдельном потоке"""
         if self.is_running:
             return
         
+        self._drop_sentinels()
         self.is_running = True
         self.processor_thread = threading.Thread(
             target=self._process_loop,
@@ -90,37 +106,55 @@ class TTSQueueManager:
     def stop(self):
         """Остановить обработчик очереди"""
         self.is_running = False
+        # Будим обработчик, ждущий на пустой очереди (если очередь полна -
+        # get() и так вернётся сразу)
+        try:
+            self.queue.put_nowait((float('-inf'), next(self._counter), 0.0, None))
+        except queue.Full:
+            pass
         if self.processor_thread:
             self.processor_thread.join(timeout=2)
+        # Обработчик мог выйти из цикла, не забрав сторожевой элемент
+        if not (self.processor_thread and self.processor_thread.is_alive()):
+            self._drop_sentinels()
         logger.info("[TTS] Queue Manager остановлен")
     
+    def _drop_sentinels(self):
+        """Убрать из очереди сторожевые элементы stop() (приоритет -inf - всегда в вершине кучи)"""
+        with self.queue.mutex:
+            heap = self.queue.queue
+            while heap and heap[0][3] is None:
+                heapq.heappop(heap)
+                self.queue.not_full.notify()
+    
     def _process_loop(self):
         """Основной цикл обработки очереди - работает в отдельном потоке"""
         while self.is_running:
-            now = time.time()
-            
-            # ✅ Проверяем дебаунс (не спешим между озвучками)
-            if now - self.last_speak_time < self.debounce_interval:
-                time.sleep(0.05)
+            # ✅ Дебаунс: спим ровно до конца окна, а не опрашиваем
+            wait = self.debounce_interval - (time.time() - self.last_speak_time)
+            if wait > 0:
+                time.sleep(wait)
                 continue
             
-            # ✅ Проверяем, не говорит ли TTS
+            # ✅ Проверяем, не говорит ли TTS (ждём сигнала окончания фразы)
             if self.tts.is_busy():
-                time.sleep(0.1)
+                speaking_done = self.tts.speaking_done
+                if not speaking_done.is_set():
+                    speaking_done.wait(timeout=0.5)
+                else:
+                    time.sleep(0.1)
                 continue
             
-            with self.lock:
-                if not self.queue:
-                    time.sleep(0.1)
-                    continue
-                
-                # ✅ Выбираем элемент с наивысшим приоритетом
-                item = max(self.queue, key=lambda x: (x['priority'], -x['timestamp']))
-                self.queue.remove(item)
+            # ✅ Берём элемент с наивысшим приоритетом (спим, пока очередь пуста)
+            item = self.queue.get()[3]
+            if not self.is_running:
+                break
+            if item is None:  # сторожевой элемент от прошлого stop()
+                continue
             
             # ✅ Озвучиваем
             try:
-                self.tts.speak(item['text'], emotion=item['emotion'])
+                self.tts.speak(item.text, emotion=item.emotion)
                 self.last_speak_time = time.time()
                 
                 priority_name = {
@@ -128,16 +162,15 @@ class TTSQueueManager:
                     8: "KILL",
                     5: "REGULAR",
                     1: "COMMENT"
-                }.get(item['priority'], f"P{item['priority']}")
+                }.get(item.priority, f"P{item.priority}")
                 
-                logger.info(f"[TTS] 🎤 [{priority_name}] {item['text'][:70]}")
+                logger.info(f"[TTS] 🎤 [{priority_name}] {item.text[:70]}")
             except Exception as e:
                 logger.error(f"[TTS] ❌ Ошибка озвучки: {e}")
     
     def get_queue_size(self) -> int:
         """Получить текущий размер очереди"""
-        with self.lock:
-            return len(self.queue)
+        return self.queue.qsize()
     
     def get_status(self) -> Dict:
         """Получить детальный статус менеджера"""
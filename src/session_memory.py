@@ -5,19 +5,75 @@ IRIS Session Memory v3.0 - Система памяти сессий
 
 import json
 import os
+import sys
+import heapq
 import time
+from collections import Counter, deque
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Any, Set
+from dataclasses import dataclass, field, is_dataclass
 from pathlib import Path
 import threading
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('SessionMemory')
 
 
-@dataclass
+# orjson сериализует dataclass напрямую и в разы быстрее; stdlib - запасной вариант
+if orjson is not None:
+    def _json_dumps(data: Any, indent: bool = False) -> bytes:
+        """Сериализация в UTF-8 JSON (bytes)"""
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    
+    _json_loads = orjson.loads
+else:
+    def _json_default(obj: Any) -> Any:
+        if is_dataclass(obj):
+            # Поверхностно по полям: вложенное json обойдёт сам, без deepcopy из asdict()
+            return {name: getattr(obj, name) for name in obj.__slots__}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    
+    def _json_dumps(data: Any, indent: bool = False) -> bytes:
+        """Сериализация в UTF-8 JSON (bytes)"""
+        if indent:
+            return json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+        return json.dumps(
+            data, ensure_ascii=False, separators=(',', ':'), default=_json_default
+        ).encode('utf-8')
+    
+    _json_loads = json.loads
+
+
+def _read_jsonl(path: Path) -> List[Any]:
+    """Прочитать JSONL, пропуская недописанные строки (аварийное завершение)"""
+    items = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                items.append(_json_loads(line))
+            except ValueError:
+                continue
+    return items
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Атомарная запись: временный файл + os.replace (файл не бьётся при падении)"""
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+@dataclass(slots=True)
 class MemoryEntry:
     """Запись в памяти"""
     id: str
@@ -28,9 +84,16 @@ class MemoryEntry:
     access_count: int = 0
     tags: List[str] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'MemoryEntry':
+        """Позиционный конструктор из загруженного JSON (без **kwargs)"""
+        return cls(d['id'], sys.intern(d['category']), d['content'], d.get('importance', 0.5),
+                   d.get('timestamp', 0.0), d.get('access_count', 0),
+                   d.get('tags') or [], d.get('metadata') or {})
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationEntry:
     """Запись разговора"""
     role: str
@@ -38,9 +101,15 @@ class ConversationEntry:
     timestamp: float = field(default_factory=time.time)
     emotion: str = "neutral"
     context: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'ConversationEntry':
+        """Позиционный конструктор из загруженного JSON (без **kwargs)"""
+        return cls(sys.intern(d['role']), d['content'], d.get('timestamp', 0.0),
+                   sys.intern(d.get('emotion', 'neutral')), d.get('context') or {})
 
 
-@dataclass
+@dataclass(slots=True)
 class GameEventEntry:
     """Запись игрового события"""
     event_type: str
@@ -51,7 +120,7 @@ class GameEventEntry:
     round_number: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class UserPreference:
     """Предпочтение пользователя"""
     key: str
@@ -59,6 +128,13 @@ class UserPreference:
     confidence: float = 0.5
     updated_at: float = field(default_factory=time.time)
     source: str = "inferred"
+    access_count: int = 0
+    
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'UserPreference':
+        """Позиционный конструктор из загруженного JSON (без **kwargs)"""
+        return cls(d['key'], d['value'], d.get('confidence', 0.5), d.get('updated_at', 0.0),
+                   sys.intern(d.get('source', 'inferred')), d.get('access_count', 0))
 
 
 class SessionMemory:
@@ -67,6 +143,9 @@ class SessionMemory:
     Сохраняет контекст разговоров, игровые события, предпочтения пользователя
     """
     
+    # Порог ротации журнала разговора: при превышении он сжимается до последних 50 записей
+    CONV_LOG_MAX_BYTES = 1024 * 1024
+    
     def __init__(self, 
                  data_dir: str = None,
                  max_conversation_history: int = 100,
@@ -90,10 +169,20 @@ class SessionMemory:
         
         self.current_session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        self.conversation_history: List[ConversationEntry] = []
-        self.game_events: List[GameEventEntry] = []
+        # deque(maxlen) - вытеснение старых записей за O(1) без копирования списка
+        self.conversation_history: deque = deque(maxlen=max_conversation_history)
+        self.game_events: deque = deque(maxlen=max_game_events)
+        # Готовые строки "Роль: текст" для контекста LLM (параллельно истории)
+        self._role_tagged_lines: deque = deque(maxlen=max_conversation_history)
+        # Кэш get_conversation_context: (max_tokens, поколение) -> строка
+        self._context_gen = 0
+        self._context_cache: Dict[tuple, str] = {}
         self.user_preferences: Dict[str, UserPreference] = {}
         self.long_term_memory: List[MemoryEntry] = []
+        # Инвертированный индекс для recall(): позиции записей в long_term_memory
+        self._by_category: Dict[str, List[int]] = {}
+        self._by_tag: Dict[str, Set[int]] = {}
+        self._content_lower: List[str] = []
         
         self.session_context = {
             'streamer_name': '',
@@ -108,88 +197,225 @@ class SessionMemory:
         
         self._running = False
         self._save_thread = None
+        self._stop_event = threading.Event()
         self._lock = threading.Lock()
+        # Сериализует самих писателей (автосохранение, remember, stop),
+        # не блокируя читателей и add_* на время кодирования JSON
+        self._save_lock = threading.Lock()
         
+        # Флаги изменений: автосохранение пропускает нетронутые файлы
+        self._prefs_dirty = False
+        self._memory_dirty = False
+        # Обращения из recall() копятся здесь (позиция записи -> число)
+        # и переносятся в access_count только при сохранении
+        self._pending_access: Counter = Counter()
+        self._next_mem_id = 0
+        # Долговременная память читается с диска только при первом recall/remember.
+        # Формат JSONL: remember() дописывает строку, а не переписывает весь файл
+        self._ltm_path = self._get_file_path("long_term_memory.jsonl")
+        self._ltm_fh = None
+        self._ltm_loaded = False
+        # Журнал разговора (JSONL, только дозапись; буфер сбрасывает автосохранение)
+        self._conv_log_path = self._get_file_path("recent_conversation.jsonl")
+        self._conv_log_fh = None
+        # История разговора грузится в фоне из start() или при первом обращении
+        self._history_loaded = threading.Event()
+        self._history_load_lock = threading.Lock()
+        
+        # Синхронно - только маленький файл предпочтений (нужен get_preference)
         self._load_persistent_data()
         
         print(f"[MEMORY] Система памяти инициализирована: {self.data_dir}")
         print(f"[MEMORY] ID сессии: {self.current_session_id}")
     
+    @staticmethod
+    def _tail(entries: deque, count: int) -> List:
+        """Последние count элементов deque (deque не поддерживает срезы)"""
+        return list(islice(entries, max(0, len(entries) - count), None))
+    
+    def _index_memory(self, entry: MemoryEntry):
+        """Добавить запись в долговременную память и в индексы (под lock)"""
+        idx = len(self.long_term_memory)
+        self.long_term_memory.append(entry)
+        self._by_category.setdefault(entry.category, []).append(idx)
+        for tag in entry.tags:
+            self._by_tag.setdefault(tag, set()).add(idx)
+        self._content_lower.append(entry.content.lower())
+    
+    def _append_history(self, entry: ConversationEntry):
+        """Добавить запись в историю и её строку для контекста (под lock)"""
+        role_name = "Пользователь" if entry.role == "user" else "Ирис"
+        self.conversation_history.append(entry)
+        self._role_tagged_lines.append(f"{role_name}: {entry.content}")
+        self._context_gen += 1
+    
     def _get_file_path(self, filename: str) -> Path:
         """Получить путь к файлу данных"""
         return self.data_dir / filename
     
     def _load_persistent_data(self):
-        """Загрузка сохранённых данных"""
+        """Загрузка сохранённых предпочтений"""
         try:
             prefs_file = self._get_file_path("user_preferences.json")
             if prefs_file.exists():
-                with open(prefs_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for key, pref_data in data.items():
-                        self.user_preferences[key] = UserPreference(**pref_data)
+                with open(prefs_file, 'rb') as f:
+                    data = _json_loads(f.read())
+                from_dict = UserPreference.from_dict
+                self.user_preferences.update({key: from_dict(d) for key, d in data.items()})
                 print(f"[MEMORY] Загружено {len(self.user_preferences)} предпочтений")
         except Exception as e:
             logger.error(f"Ошибка загрузки предпочтений: {e}")
-        
+    
+    def _ensure_history_loaded(self):
+        """Загрузить историю разговора один раз (повторные вызовы ждут первый)"""
+        if self._history_loaded.is_set():
+            return
+        with self._history_load_lock:
+            if self._history_loaded.is_set():
+                return
+            try:
+                self._load_history()
+            finally:
+                self._history_loaded.set()
+    
+    def _load_history(self):
+        """Загрузка истории разговора за последние 24 часа"""
         try:
-            memory_file = self._get_file_path("long_term_memory.json")
-            if memory_file.exists():
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for entry_data in data:
-                        self.long_term_memory.append(MemoryEntry(**entry_data))
-                print(f"[MEMORY] Загружено {len(self.long_term_memory)} записей памяти")
+            data = None
+            if self._conv_log_path.exists():
+                data = _read_jsonl(self._conv_log_path)
+            else:
+                # Старый формат recent_conversation.json
+                legacy_file = self._get_file_path("recent_conversation.json")
+                if legacy_file.exists():
+                    with open(legacy_file, 'rb') as f:
+                        data = _json_loads(f.read())
+            
+            if data is not None:
+                cutoff_time = time.time() - 24 * 3600
+                recent = [d for d in data if d.get('timestamp', 0) > cutoff_time]
+                entries = list(map(ConversationEntry.from_dict, recent))
+                with self._lock:
+                    for entry in entries:
+                        self._append_history(entry)
+                print(f"[MEMORY] Загружено {len(self.conversation_history)} записей разговора")
         except Exception as e:
-            logger.error(f"Ошибка загрузки памяти: {e}")
+            logger.error(f"Ошибка загрузки истории: {e}")
+    
+    def _ensure_ltm_loaded(self):
+        """Ленивая загрузка долговременной памяти (под lock)"""
+        if self._ltm_loaded:
+            return
+        self._ltm_loaded = True
         
         try:
-            history_file = self._get_file_path("recent_conversation.json")
-            if history_file.exists():
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    cutoff_time = time.time() - 24 * 3600
-                    for entry_data in data:
-                        if entry_data.get('timestamp', 0) > cutoff_time:
-                            self.conversation_history.append(ConversationEntry(**entry_data))
-                print(f"[MEMORY] Загружено {len(self.conversation_history)} записей разговора")
+            if self._ltm_path.exists():
+                for entry in map(MemoryEntry.from_dict, _read_jsonl(self._ltm_path)):
+                    self._index_memory(entry)
+                print(f"[MEMORY] Загружено {len(self.long_term_memory)} записей памяти")
+            else:
+                # Разовая миграция со старого long_term_memory.json
+                legacy_file = self._get_file_path("long_term_memory.json")
+                if legacy_file.exists():
+                    with open(legacy_file, 'rb') as f:
+                        data = _json_loads(f.read())
+                    for entry in map(MemoryEntry.from_dict, data):
+                        self._index_memory(entry)
+                    _atomic_write_bytes(
+                        self._ltm_path,
+                        b''.join([_json_dumps(entry) + b'\n' for entry in self.long_term_memory])
+                    )
+                    print(f"[MEMORY] Загружено {len(self.long_term_memory)} записей памяти")
         except Exception as e:
-            logger.error(f"Ошибка загрузки истории: {e}")
+            logger.error(f"Ошибка загрузки памяти: {e}")
     
-    def _save_persistent_data(self):
-        """Сохранение данных на диск"""
+    def _ltm_append(self, entry: MemoryEntry):
+        """Дописать запись в long_term_memory.jsonl (под lock)"""
+        if self._ltm_fh is None:
+            self._ltm_fh = open(self._ltm_path, 'ab')
+        self._ltm_fh.write(_json_dumps(entry) + b'\n')
+    
+    def _conv_log_append(self, entry: ConversationEntry):
+        """Дописать реплику в recent_conversation.jsonl без flush (под lock)"""
+        if self._conv_log_fh is None:
+            self._conv_log_fh = open(self._conv_log_path, 'ab')
+        self._conv_log_fh.write(_json_dumps(entry) + b'\n')
+    
+    def _flush_conv_log(self):
+        """Сбросить журнал разговора и сжать его при превышении порога (под lock)"""
+        fh = self._conv_log_fh
+        if fh is None:
+            return
+        fh.flush()
+        if fh.tell() > self.CONV_LOG_MAX_BYTES:
+            fh.close()
+            self._conv_log_fh = None
+            tail = self._tail(self.conversation_history, 50)
+            _atomic_write_bytes(
+                self._conv_log_path, b''.join([_json_dumps(entry) + b'\n' for entry in tail])
+            )
+    
+    def _rewrite_ltm(self, memory: List[MemoryEntry]):
+        """Переписать JSONL целиком (нужно только когда изменились access_count)"""
+        data = b''.join([_json_dumps(entry) + b'\n' for entry in memory])
         with self._lock:
-            try:
-                prefs_file = self._get_file_path("user_preferences.json")
-                with open(prefs_file, 'w', encoding='utf-8') as f:
-                    data = {k: asdict(v) for k, v in self.user_preferences.items()}
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"Ошибка сохранения предпочтений: {e}")
+            # Записи, которые remember() добавил, пока кодировался снимок
+            tail = self.long_term_memory[len(memory):]
+            if tail:
+                data += b''.join([_json_dumps(entry) + b'\n' for entry in tail])
+            if self._ltm_fh is not None:
+                self._ltm_fh.close()
+                self._ltm_fh = None
+            _atomic_write_bytes(self._ltm_path, data)
+    
+    def _save_persistent_data(self):
+        """Сохранение данных на диск (компактный JSON - файлы читает только программа)"""
+        with self._save_lock:
+            # Под основным lock только снимок контейнеров, кодирование и запись - без него
+            with self._lock:
+                if self._pending_access:
+                    memory = self.long_term_memory
+                    for idx, count in self._pending_access.items():
+                        memory[idx].access_count += count
+                    self._pending_access.clear()
+                    self._memory_dirty = True
+                
+                prefs = dict(self.user_preferences) if self._prefs_dirty else None
+                memory = list(self.long_term_memory) if self._memory_dirty else None
+                self._prefs_dirty = self._memory_dirty = False
+                
+                try:
+                    self._flush_conv_log()
+                except Exception as e:
+                    logger.error(f"Ошибка сохранения истории: {e}")
+                
+                # Новые записи уже дописаны remember() - достаточно сбросить буфер
+                if memory is None and self._ltm_fh is not None:
+                    try:
+                        self._ltm_fh.flush()
+                    except Exception as e:
+                        logger.error(f"Ошибка сохранения памяти: {e}")
             
-            try:
-                memory_file = self._get_file_path("long_term_memory.json")
-                with open(memory_file, 'w', encoding='utf-8') as f:
-                    data = [asdict(entry) for entry in self.long_term_memory]
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"Ошибка сохранения памяти: {e}")
+            if prefs is not None:
+                try:
+                    prefs_file = self._get_file_path("user_preferences.json")
+                    _atomic_write_bytes(prefs_file, _json_dumps(prefs))
+                except Exception as e:
+                    self._prefs_dirty = True
+                    logger.error(f"Ошибка сохранения предпочтений: {e}")
             
-            try:
-                history_file = self._get_file_path("recent_conversation.json")
-                with open(history_file, 'w', encoding='utf-8') as f:
-                    data = [asdict(entry) for entry in self.conversation_history[-50:]]
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"Ошибка сохранения истории: {e}")
+            if memory is not None:
+                try:
+                    self._rewrite_ltm(memory)
+                except Exception as e:
+                    self._memory_dirty = True
+                    logger.error(f"Ошибка сохранения памяти: {e}")
+
     
     def _auto_save_loop(self):
-        """Цикл автосохранения"""
-        while self._running:
-            time.sleep(self.auto_save_interval)
-            if self._running:
-                self._save_persistent_data()
+        """Цикл автосохранения (stop() будит его сразу через _stop_event)"""
+        while not self._stop_event.wait(self.auto_save_interval):
+            self._save_persistent_data()
     
     def add_conversation(self, role: str, content: str, 
                         emotion: str = "neutral", 
@@ -204,19 +430,27 @@ class SessionMemory:
             context: Дополнительный контекст
         """
         entry = ConversationEntry(
-            role=role,
+            role=sys.intern(role),
             content=content,
-            emotion=emotion,
+            emotion=sys.intern(emotion),
             context=context or {}
         )
         
+        self._ensure_history_loaded()
+        evicted = None
         with self._lock:
-            self.conversation_history.append(entry)
-            
-            if len(self.conversation_history) > self.max_conversation_history:
-                old_entries = self.conversation_history[:10]
-                self._archive_conversations(old_entries)
-                self.conversation_history = self.conversation_history[10:]
+            # Самую старую запись вытесняем вручную, чтобы успеть её архивировать
+            if len(self.conversation_history) == self.conversation_history.maxlen:
+                evicted = self.conversation_history.popleft()
+            self._append_history(entry)
+            try:
+                self._conv_log_append(entry)
+            except Exception as e:
+                logger.error(f"Ошибка сохранения истории: {e}")
+        
+        # Архивация вызывает remember(), который сам берёт lock
+        if evicted is not None:
+            self._archive_conversations([evicted])
     
     def add_game_event(self, event_type: str, data: Dict[str, Any],
                       reaction: str = None):
@@ -229,7 +463,7 @@ class SessionMemory:
             reaction: Реакция Ирис
         """
         entry = GameEventEntry(
-            event_type=event_type,
+            event_type=sys.intern(event_type),
             data=data,
             reaction=reaction,
             map_name=self.session_context.get('current_map', ''),
@@ -243,9 +477,6 @@ class SessionMemory:
                 self.session_context['total_kills'] = self.session_context.get('total_kills', 0) + 1
             elif event_type == 'death':
                 self.session_context['total_deaths'] = self.session_context.get('total_deaths', 0) + 1
-            
-            if len(self.game_events) > self.max_game_events:
-                self.game_events = self.game_events[-self.max_game_events:]
     
     def set_preference(self, key: str, value: Any, 
                       confidence: float = 0.5, source: str = "inferred"):
@@ -259,29 +490,24 @@ class SessionMemory:
             source: Источник (explicit, inferred, learned)
         """
         with self._lock:
-            if key in self.user_preferences:
-                existing = self.user_preferences[key]
-                if source == "explicit" or confidence > existing.confidence:
-                    self.user_preferences[key] = UserPreference(
-                        key=key,
-                        value=value,
-                        confidence=confidence,
-                        source=source
-                    )
-            else:
+            existing = self.user_preferences.get(key)
+            if existing is None or source == "explicit" or confidence > existing.confidence:
                 self.user_preferences[key] = UserPreference(
                     key=key,
                     value=value,
                     confidence=confidence,
-                    source=source
+                    source=sys.intern(source)
                 )
+                self._prefs_dirty = True
+                self._context_gen += 1
     
     def get_preference(self, key: str, default: Any = None) -> Any:
         """Получить предпочтение пользователя"""
         with self._lock:
             if key in self.user_preferences:
                 pref = self.user_preferences[key]
-                pref.access_count = getattr(pref, 'access_count', 0) + 1
+                pref.access_count += 1
+                self._prefs_dirty = True
                 return pref.value
             return default
     
@@ -298,21 +524,28 @@ class SessionMemory:
             tags: Теги для поиска
             metadata: Дополнительные данные
         """
-        import uuid
-        entry = MemoryEntry(
-            id=str(uuid.uuid4()),
-            category=category,
-            content=content,
-            importance=importance,
-            tags=tags or [],
-            metadata=metadata or {}
-        )
-        
         with self._lock:
-            self.long_term_memory.append(entry)
+            self._ensure_ltm_loaded()
+            # ID сессии + счётчик: уникально без uuid4/os.urandom на каждый вызов
+            self._next_mem_id += 1
+            entry = MemoryEntry(
+                id=f"{self.current_session_id}:{self._next_mem_id}",
+                category=sys.intern(category),
+                content=content,
+                importance=importance,
+                tags=tags or [],
+                metadata=metadata or {}
+            )
+            self._index_memory(entry)
             
-            if importance >= 0.8:
-                self._save_persistent_data()
+            # O(1) дозапись вместо перекодирования всей памяти; важное - сразу на диск
+            try:
+                self._ltm_append(entry)
+                if importance >= 0.8:
+                    self._ltm_fh.flush()
+            except Exception as e:
+                self._memory_dirty = True
+                logger.error(f"Ошибка сохранения памяти: {e}")
     
     def recall(self, query: str = None, category: str = None,
               tags: List[str] = None, limit: int = 10) -> List[MemoryEntry]:
@@ -329,31 +562,44 @@ class SessionMemory:
             Список найденных записей
         """
         with self._lock:
-            results = []
+            self._ensure_ltm_loaded()
+            # Кандидаты из индексов вместо полного прохода по памяти
+            candidates = None
+            if category:
+                candidates = self._by_category.get(category, [])
+            if tags:
+                tagged = set().union(*(self._by_tag.get(tag, ()) for tag in tags))
+                if candidates is not None:
+                    tagged.intersection_update(candidates)
+                candidates = sorted(tagged)
+            if candidates is None:
+                candidates = range(len(self.long_term_memory))
             
-            for entry in self.long_term_memory:
-                if category and entry.category != category:
-                    continue
-                
-                if tags and not any(tag in entry.tags for tag in tags):
-                    continue
-                
-                if query:
-                    query_lower = query.lower()
-                    if query_lower not in entry.content.lower():
-                        continue
-                
-                entry.access_count += 1
-                results.append(entry)
+            query_lower = query.lower() if query else None
+            content_lower = self._content_lower
+            memory = self.long_term_memory
+            pending = self._pending_access
+            
+            def touch(idx: int) -> int:
+                pending[idx] += 1
+                return idx
             
-            results.sort(key=lambda x: (x.importance, x.access_count), reverse=True)
-            return results[:limit]
+            # Генератор прямо в nlargest: O(N log limit) без полного списка и сортировки
+            matched = (touch(idx) for idx in candidates
+                       if not query_lower or query_lower in content_lower[idx])
+            top = heapq.nlargest(
+                limit, matched,
+                key=lambda idx: (memory[idx].importance, memory[idx].access_count + pending[idx])
+            )
+            return [memory[idx] for idx in top]
     
     def get_recent_conversation(self, count: int = 10) -> List[Dict[str, Any]]:
         """Получить последние записи разговора"""
+        self._ensure_history_loaded()
         with self._lock:
-            entries = self.conversation_history[-count:]
-            return [asdict(entry) for entry in entries]
+            entries = self._tail(self.conversation_history, count)
+        return [{'role': e.role, 'content': e.content, 'timestamp': e.timestamp,
+                 'emotion': e.emotion, 'context': e.context} for e in entries]
     
     def get_conversation_context(self, max_tokens: int = 2000) -> str:
         """
@@ -365,32 +611,53 @@ class SessionMemory:
         Returns:
             Текстовый контекст
         """
+        # Ничего не менялось с прошлого вызова - отдаём кэш без lock
+        cached = self._context_cache.get((max_tokens, self._context_gen))
+        if cached is not None:
+            return cached
+        
+        self._ensure_history_loaded()
+        # Под lock только снимок, форматирование строки - снаружи
         with self._lock:
-            context_parts = []
-            
-            for pref_key in ['streamer_name', 'communication_style', 'humor_level']:
-                if pref_key in self.user_preferences:
-                    pref = self.user_preferences[pref_key]
-                    context_parts.append(f"Пользователь: {pref_key}={pref.value}")
-            
-            for entry in self.conversation_history[-20:]:
-                role_name = "Пользователь" if entry.role == "user" else "Ирис"
-                context_parts.append(f"{role_name}: {entry.content}")
-            
-            context = "\n".join(context_parts)
-            
-            if len(context) > max_tokens:
-                context = context[-max_tokens:]
-            
-            return context
+            gen = self._context_gen
+            prefs = [(pref_key, self.user_preferences[pref_key].value)
+                     for pref_key in ('streamer_name', 'communication_style', 'humor_level')
+                     if pref_key in self.user_preferences]
+            lines = self._tail(self._role_tagged_lines, 20)
+        
+        context_parts = [f"Пользователь: {pref_key}={value}" for pref_key, value in prefs]
+        context_parts.extend(lines)
+        
+        # Бюджет считаем с конца по целым строкам: склеиваем только хвост,
+        # который влезает, и не режем реплику посередине
+        cut = len(context_parts)
+        used = -1
+        for line in reversed(context_parts):
+            used += len(line) + 1
+            if used > max_tokens:
+                break
+            cut -= 1
+        
+        if cut == len(context_parts) and context_parts and max_tokens > 0:
+            # Даже последняя реплика не влезает целиком - берём её хвост
+            context = context_parts[-1][-max_tokens:]
+        else:
+            context = "\n".join(context_parts[cut:])
+        
+        if len(self._context_cache) >= 4:
+            self._context_cache.clear()
+        self._context_cache[(max_tokens, gen)] = context
+        return context
     
     def get_session_summary(self) -> Dict[str, Any]:
         """Получить сводку текущей сессии"""
+        self._ensure_history_loaded()
         with self._lock:
             session_duration = time.time() - self.session_context.get('session_start', time.time())
             
-            kills = sum(1 for e in self.game_events if e.event_type == 'kill')
-            deaths = sum(1 for e in self.game_events if e.event_type == 'death')
+            # Счётчики ведёт add_game_event - пересчитывать game_events не нужно
+            kills = self.session_context.get('total_kills', 0)
+            deaths = self.session_context.get('total_deaths', 0)
             
             return {
                 'session_id': self.current_session_id,
@@ -419,6 +686,7 @@ class SessionMemory:
         """Обновить контекст сессии"""
         with self._lock:
             self.session_context[key] = value
+            self._context_gen += 1
     
     def get_session_context(self, key: str = None) -> Any:
         """Получить контекст сессии"""
@@ -433,6 +701,12 @@ class SessionMemory:
             return
         
         self._running = True
+        self._stop_event.clear()
+        threading.Thread(
+            target=self._ensure_history_loaded,
+            daemon=True,
+            name="MemoryHistoryLoad"
+        ).start()
         self._save_thread = threading.Thread(
             target=self._auto_save_loop,
             daemon=True,
@@ -447,17 +721,35 @@ class SessionMemory:
             return
         
         self._running = False
+        self._stop_event.set()
         
         if self._save_thread:
             self._save_thread.join(timeout=2.0)
         
+        # Сводку считаем один раз заранее; данные и лог сессии пишутся
+        # в разные файлы, поэтому сохраняем их параллельно
+        summary = self.get_session_summary()
+        log_thread = threading.Thread(
+            target=self._save_session_log,
+            args=(summary,),
+            daemon=True,
+            name="MemorySessionLog"
+        )
+        log_thread.start()
+        
         self._save_persistent_data()
         
-        self._save_session_log()
+        with self._lock:
+            for fh in (self._ltm_fh, self._conv_log_fh):
+                if fh is not None:
+                    fh.close()
+            self._ltm_fh = self._conv_log_fh = None
+        
+        log_thread.join()
         
         print("[MEMORY] Система памяти остановлена")
     
-    def _save_session_log(self):
+    def _save_session_log(self, summary: Dict[str, Any] = None):
         """Сохранить лог сессии"""
         try:
             sessions_dir = self.data_dir / "sessions"
@@ -465,17 +757,19 @@ class SessionMemory:
             
             session_file = sessions_dir / f"session_{self.current_session_id}.json"
             
+            if summary is None:
+                summary = self.get_session_summary()
+            
             session_data = {
                 'session_id': self.current_session_id,
-                'summary': self.get_session_summary(),
-                'context': self.session_context,
-                'conversation_count': len(self.conversation_history),
-                'events_count': len(self.game_events),
+                'summary': summary,
+                'context': self.get_session_context(),
+                'conversation_count': summary['conversation_count'],
+                'events_count': summary['events_count'],
             }
             
-            with open(session_file, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, ensure_ascii=False, indent=2)
-                
+            _atomic_write_bytes(session_file, _json_dumps(session_data, indent=True))
+            
         except Exception as e:
             logger.error(f"Ошибка сохранения лога сессии: {e}")
 
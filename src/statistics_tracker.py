@@ -3,20 +3,112 @@ IRIS Statistics Tracker v3.0 - Система статистики за все 
 Отслеживание достижений, статистики игры и прогресса стримера
 """
 
+import array
+import atexit
+import heapq
 import json
+import mmap
 import os
+import queue
+import struct
+import sys
 import time
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields, is_dataclass, replace
 from pathlib import Path
 from enum import Enum
 import threading
 import logging
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger('Statistics')
 
+# Журнал событий (events.log): бинарные записи фиксированной длины, только дозапись.
+# Полный JSON-снимок пишется в end_session, после чего журнал обнуляется
+_WAL_OP_NAME = 0     # определение имени: id -> строка (оружие/карта)
+_WAL_OP_KILL = 1
+_WAL_OP_DEATH = 2
+_WAL_OP_ROUND = 3
+_WAL_OP_CLUTCH = 4
+_WAL_EVENT = struct.Struct('<BdHHB')   # op, timestamp, weapon_id, map_id, arg
+_WAL_NAME = struct.Struct('<BHH')      # op, id, длина UTF-8 имени
+_WAL_FLUSH_INTERVAL = 5.0
+
+
+class _C:
+    """Индексы счётчиков LifetimeStats в массиве StatisticsTracker._counts"""
+    KILLS = 0
+    HEADSHOTS = 1
+    DEATHS = 2
+    ACES = 3
+    CLUTCHES = 4
+    ROUNDS_WON = 5
+    ROUNDS_LOST = 6
+    SESSIONS = 7
+    STREAM_MINUTES = 8
+    LONGEST_SESSION = 9
+    BEST_KILL_STREAK = 10
+    CURRENT_WIN_STREAK = 11
+    BEST_WIN_STREAK = 12
+    # Первые THREAD_LOCAL счётчиков ещё и копятся частично в каждом потоке
+    THREAD_LOCAL = 3
+
+
+# Имена полей LifetimeStats в порядке индексов _C
+_COUNTER_FIELDS = ('total_kills', 'total_headshots', 'total_deaths', 'total_aces',
+                   'total_clutches', 'total_rounds_won', 'total_rounds_lost',
+                   'total_sessions', 'total_stream_minutes', 'longest_session_minutes',
+                   'best_kill_streak', 'current_win_streak', 'best_win_streak')
+_COUNTER_INDEX = {name: idx for idx, name in enumerate(_COUNTER_FIELDS)}
+
+# Статистика карты: три соседние ячейки массива счётчиков на каждую карту
+_MAP_KILLS, _MAP_DEATHS, _MAP_ROUNDS = 0, 1, 2
+_MAP_FIELDS = ('kills', 'deaths', 'rounds')
+
+
+# Яркий момент сессии (эйс/клатч): кортеж вместо словаря на каждое событие,
+# в JSON пишется списком [type, timestamp, weapon, enemies]
+Highlight = namedtuple('Highlight', 'type timestamp weapon enemies')
+
+
+def _highlight_from(obj: Any) -> Highlight:
+    """Highlight из сохранённого списка или словаря старого формата"""
+    if isinstance(obj, dict):
+        return Highlight(obj.get('type', ''), obj.get('timestamp', 0.0),
+                         obj.get('weapon', ''), obj.get('enemies', 0))
+    return Highlight(*obj)
+
+
+# orjson сериализует dataclass напрямую; stdlib json - запасной вариант
+if orjson is not None:
+    def _orjson_default(obj: Any) -> Any:
+        if isinstance(obj, tuple):
+            return list(obj)  # namedtuple orjson сам не сериализует
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data, default=_orjson_default,
+                            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    
+    _json_loads = orjson.loads
+else:
+    def _json_default(obj: Any) -> Any:
+        if is_dataclass(obj):
+            # Поверхностный словарь по слотам: без рекурсивного копирования asdict()
+            return {name: getattr(obj, name) for name in obj.__slots__}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+    
+    _json_loads = json.loads
+
 
 class AchievementType(Enum):
     KILLS = "kills"
@@ -28,7 +120,7 @@ class AchievementType(Enum):
     SESSIONS = "sessions"
 
 
-@dataclass
+@dataclass(slots=True)
 class Achievement:
     """Достижение"""
     id: str
@@ -43,7 +135,7 @@ class Achievement:
     rarity: str = "common"
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionStats:
     """Статистика одной сессии"""
     session_id: str
@@ -58,10 +150,10 @@ class SessionStats:
     rounds_lost: int = 0
     maps_played: List[str] = field(default_factory=list)
     best_weapon: str = ""
-    highlight_moments: List[Dict] = field(default_factory=list)
+    highlight_moments: List[Highlight] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class LifetimeStats:
     """Статистика за все время"""
     total_sessions: int = 0
@@ -83,13 +175,90 @@ class LifetimeStats:
     best_win_streak: int = 0
 
 
+# Допустимые ключи lifetime-снимка (лишние ключи из файла отбрасываются)
+_LIFETIME_FIELDS = frozenset(f.name for f in fields(LifetimeStats))
+
+
+class SessionHistory:
+    """
+    История сессий в колоночном виде: по массиву на каждое поле
+    Числовые поля - array('i') (значения приводятся к int), остальные - обычные списки.
+    Хранится не больше maxlen последних сессий - окно держится при добавлении
+    """
+    
+    INT_COLUMNS = ('duration_minutes', 'kills', 'deaths', 'headshots', 'clutches',
+                   'aces', 'rounds_won', 'rounds_lost')
+    OBJ_COLUMNS = ('session_id', 'date', 'best_weapon', 'maps_played', 'highlight_moments')
+    COLUMNS = OBJ_COLUMNS[:2] + INT_COLUMNS + OBJ_COLUMNS[2:]
+    
+    __slots__ = ('columns', 'maxlen')
+    
+    def __init__(self, maxlen: int = 100):
+        self.maxlen = maxlen
+        self.columns: Dict[str, Any] = {name: array.array('i') for name in self.INT_COLUMNS}
+        self.columns.update({name: [] for name in self.OBJ_COLUMNS})
+    
+    def __len__(self) -> int:
+        return len(self.columns['session_id'])
+    
+    def __iter__(self):
+        columns = [self.columns[name] for name in self.COLUMNS]
+        for row in zip(*columns):
+            yield SessionStats(**dict(zip(self.COLUMNS, row)))
+    
+    def append(self, session: SessionStats):
+        """Разложить сессию по колонкам"""
+        for name in self.INT_COLUMNS:
+            self.columns[name].append(round(getattr(session, name)))
+        for name in self.OBJ_COLUMNS:
+            self.columns[name].append(getattr(session, name))
+        self._trim()
+    
+    def _trim(self):
+        """Отбросить самые старые сессии сверх maxlen"""
+        excess = len(self) - self.maxlen
+        if excess > 0:
+            for column in self.columns.values():
+                del column[:excess]
+    
+    def to_columns(self) -> Dict[str, Any]:
+        """Вся история: {"cols": [...], поле: [значения], ...}"""
+        data: Dict[str, Any] = {'cols': list(self.COLUMNS)}
+        for name in self.INT_COLUMNS:
+            data[name] = self.columns[name].tolist()
+        for name in self.OBJ_COLUMNS:
+            data[name] = self.columns[name]
+        return data
+    
+    @classmethod
+    def from_columns(cls, data: Any) -> 'SessionHistory':
+        """Обратное to_columns(); понимает и старый формат - список словарей"""
+        history = cls()
+        if isinstance(data, list):
+            for item in data:
+                session = SessionStats(**item)
+                session.highlight_moments = [_highlight_from(h) for h in session.highlight_moments]
+                history.append(session)
+            return history
+        for name in cls.INT_COLUMNS:
+            history.columns[name].extend(round(value) for value in data.get(name, ()))
+        for name in cls.OBJ_COLUMNS:
+            history.columns[name].extend(data.get(name, ()))
+        history.columns['highlight_moments'] = [
+            [_highlight_from(h) for h in moments] for moments in history.columns['highlight_moments']
+        ]
+        history._trim()
+        return history
+
+
 class StatisticsTracker:
     """
     Система отслеживания статистики Ирис
     Сохраняет всю историю достижений и прогресса
     """
     
-    DEFAULT_ACHIEVEMENTS = [
+    # Неизменяемые образцы: каждый трекер получает свои копии
+    DEFAULT_ACHIEVEMENTS = (
         Achievement("first_blood", "Первая кровь", "Первое убийство с Ирис", "kills", 1, icon="🩸", rarity="common"),
         Achievement("killer_10", "Новичок", "10 убийств", "kills", 10, icon="🔫", rarity="common"),
         Achievement("killer_100", "Охотник", "100 убийств", "kills", 100, icon="💀", rarity="uncommon"),
@@ -110,7 +279,23 @@ class StatisticsTracker:
         Achievement("sessions_10", "Постоянство", "10 сессий с Ирис", "sessions", 10, icon="📅", rarity="common"),
         Achievement("sessions_50", "Преданность", "50 сессий с Ирис", "sessions", 50, icon="💝", rarity="rare"),
         Achievement("sessions_100", "Неразлучны", "100 сессий с Ирис", "sessions", 100, icon="💖", rarity="legendary"),
-    ]
+    )
+    
+    _STATS_TEMPLATE = """📊 Твоя статистика за всё время:
+
+🎯 Убийств: {total_kills} (K/D: {kd_ratio})
+💀 Смертей: {total_deaths}
+🎯 Хедшотов: {total_headshots} ({headshot_percent}%)
+♠️ Эйсов: {total_aces}
+💪 Клатчей: {total_clutches}
+🔥 Лучшая серия: {best_kill_streak} убийств
+
+⏱️ Время стримов: {total_hours} часов
+📺 Сессий: {total_sessions}
+🗺️ Любимая карта: {favorite_map}
+🔫 Любимое оружие: {favorite_weapon}
+
+🏆 Достижений: {unlocked}/{achievements_total}"""
     
     def __init__(self, data_dir: str = None, auto_save: bool = True):
         """
@@ -125,120 +310,297 @@ class StatisticsTracker:
         
         self.auto_save = auto_save
         
-        self.lifetime_stats = LifetimeStats()
+        # Числовые счётчики - в массиве _counts, остальные поля - в _lifetime;
+        # lifetime_stats собирает из них полную копию
+        self._lifetime = LifetimeStats()
+        self._counts = array.array('q', bytes(8 * len(_COUNTER_FIELDS)))
         self.achievements: Dict[str, Achievement] = {}
-        self.session_history: List[SessionStats] = []
+        self.session_history = SessionHistory()
         self.current_session: Optional[SessionStats] = None
         
         self.kill_streak = 0
         self.round_kills = 0
         
-        self.weapon_kills: Dict[str, int] = {}
-        self.map_stats: Dict[str, Dict[str, int]] = {}
+        # Оружие и карты - индексы в компактных массивах счётчиков;
+        # словари weapon_kills / map_stats собираются только при чтении
+        self.weapon_kills = {}
+        self.map_stats = {}
+        # Текущие лидеры (имя, значение): обновляются на каждом событии за O(1)
+        self._fav_weapon: Tuple[str, int] = ("", 0)
+        self._fav_map: Tuple[str, int] = ("", 0)
         
         self._running = False
         self._lock = threading.Lock()
+        self._stats_message: Optional[Tuple[tuple, str]] = None
+        # Версия данных: растёт на каждой записи, сбрасывает кэш сводки
+        self._version = 0
+        self._summary_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+        
+        # Горячие счётчики копятся по потокам (увеличиваются под lock вместе
+        # с записью в журнал) и складываются с базой только при чтении
+        self._tls = threading.local()
+        self._tls_counters: List[array.array] = []
+        
+        self._wal = None
+        self._wal_ids: Dict[str, int] = {'': 0}
+        self._last_flush = 0.0
         
         self._init_achievements()
         self._load_data()
+        self._load_session_history()
+        self._update_favorite_weapon()
+        self._update_favorite_map()
+        self._index_achievements()
+        self._replay_wal()
+        
+        if self.auto_save:
+            self._wal = open(self.data_dir / "events.log", 'ab', buffering=1 << 16)
+        
+        # Снимки пишет фоновый поток; подряд идущие запросы схлопываются в один
+        self._save_q: queue.Queue = queue.Queue(maxsize=1)
+        threading.Thread(target=self._writer_loop, daemon=True, name="StatsWriter").start()
+        atexit.register(self.flush)
         
-        print(f"[STATS] Система статистики инициализирована: {self.data_dir}")
+        logger.info("[STATS] Система статистики инициализирована: %s", self.data_dir)
     
     def _init_achievements(self):
         """Инициализация достижений"""
-        for achievement in self.DEFAULT_ACHIEVEMENTS:
-            self.achievements[achievement.id] = Achievement(
-                id=achievement.id,
-                name=achievement.name,
-                description=achievement.description,
-                type=achievement.type,
-                requirement=achievement.requirement,
-                icon=achievement.icon,
-                rarity=achievement.rarity
-            )
+        self.achievements = {a.id: replace(a) for a in self.DEFAULT_ACHIEVEMENTS}
+    
+    def _index_achievements(self):
+        """Заблокированные достижения по типу, по возрастанию требования"""
+        self._by_type: Dict[str, List[Achievement]] = {}
+        for ach in self.achievements.values():
+            if not ach.unlocked:
+                self._by_type.setdefault(ach.type, []).append(ach)
+        for pending in self._by_type.values():
+            pending.sort(key=lambda a: a.requirement)
     
     def _load_data(self):
-        """Загрузка сохранённых данных"""
+        """Загрузка сохранённых данных (единый снимок stats.json)"""
+        try:
+            snapshot_file = self.data_dir / "stats.json"
+            if snapshot_file.exists():
+                snapshot = _json_loads(snapshot_file.read_bytes())
+            else:
+                snapshot = self._load_legacy_snapshot()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки статистики: {e}")
+            return
+        
         try:
-            stats_file = self.data_dir / "lifetime_stats.json"
-            if stats_file.exists():
-                with open(stats_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for key, value in data.items():
-                        if hasattr(self.lifetime_stats, key):
-                            setattr(self.lifetime_stats, key, value)
-                print(f"[STATS] Загружена статистика: {self.lifetime_stats.total_kills} убийств")
+            data = snapshot.get('lifetime')
+            if data:
+                for key in data.keys() & _LIFETIME_FIELDS:
+                    idx = _COUNTER_INDEX.get(key)
+                    if idx is not None:
+                        # Массив целочисленный: дробные значения из файла округляем
+                        self._counts[idx] = round(data[key])
+                    else:
+                        setattr(self._lifetime, key, data[key])
+                logger.info("[STATS] Загружена статистика: %d убийств", self._counts[_C.KILLS])
         except Exception as e:
             logger.error(f"Ошибка загрузки статистики: {e}")
         
         try:
-            achievements_file = self.data_dir / "achievements.json"
-            if achievements_file.exists():
-                with open(achievements_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for ach_id, ach_data in data.items():
-                        if ach_id in self.achievements:
-                            self.achievements[ach_id].unlocked = ach_data.get('unlocked', False)
-                            self.achievements[ach_id].unlocked_at = ach_data.get('unlocked_at')
-                            self.achievements[ach_id].progress = ach_data.get('progress', 0)
+            data = snapshot.get('achievements')
+            if data:
+                for ach_id, ach_data in data.items():
+                    if ach_id in self.achievements:
+                        self.achievements[ach_id].unlocked = ach_data.get('unlocked', False)
+                        self.achievements[ach_id].unlocked_at = ach_data.get('unlocked_at')
+                        self.achievements[ach_id].progress = ach_data.get('progress', 0)
                 unlocked = sum(1 for a in self.achievements.values() if a.unlocked)
-                print(f"[STATS] Загружены достижения: {unlocked}/{len(self.achievements)}")
+                logger.info("[STATS] Загружены достижения: %d/%d", unlocked, len(self.achievements))
         except Exception as e:
             logger.error(f"Ошибка загрузки достижений: {e}")
         
         try:
-            weapons_file = self.data_dir / "weapon_stats.json"
-            if weapons_file.exists():
-                with open(weapons_file, 'r', encoding='utf-8') as f:
-                    self.weapon_kills = json.load(f)
+            self.weapon_kills = snapshot.get('weapons') or {}
         except Exception as e:
+            self.weapon_kills = {}
             logger.error(f"Ошибка загрузки статистики оружия: {e}")
         
         try:
-            maps_file = self.data_dir / "map_stats.json"
-            if maps_file.exists():
-                with open(maps_file, 'r', encoding='utf-8') as f:
-                    self.map_stats = json.load(f)
+            self.map_stats = snapshot.get('maps') or {}
         except Exception as e:
+            self.map_stats = {}
             logger.error(f"Ошибка загрузки статистики карт: {e}")
     
-    def _save_data(self):
-        """Сохранение данных"""
-        with self._lock:
+    def _load_legacy_snapshot(self) -> Dict[str, Any]:
+        """Снимок из старых отдельных файлов (до stats.json)"""
+        snapshot = {}
+        for key, filename in (('lifetime', "lifetime_stats.json"),
+                              ('achievements', "achievements.json"),
+                              ('weapons', "weapon_stats.json"),
+                              ('maps', "map_stats.json")):
+            path = self.data_dir / filename
             try:
-                stats_file = self.data_dir / "lifetime_stats.json"
-                with open(stats_file, 'w', encoding='utf-8') as f:
-                    json.dump(asdict(self.lifetime_stats), f, ensure_ascii=False, indent=2)
+                if path.exists():
+                    snapshot[key] = _json_loads(path.read_bytes())
             except Exception as e:
-                logger.error(f"Ошибка сохранения статистики: {e}")
+                logger.error(f"Ошибка загрузки {filename}: {e}")
+        return snapshot
+    
+    def _replay_wal(self):
+        """Доиграть события из журнала поверх последнего снимка"""
+        wal_file = self.data_dir / "events.log"
+        try:
+            if not wal_file.exists():
+                return
+            buf = wal_file.read_bytes()
+        except Exception as e:
+            logger.error(f"Ошибка чтения журнала событий: {e}")
+            return
+        
+        names = {0: ''}
+        pos, end, replayed = 0, len(buf), 0
+        while pos < end:
+            if buf[pos] == _WAL_OP_NAME:
+                if pos + _WAL_NAME.size > end:
+                    break
+                _, name_id, size = _WAL_NAME.unpack_from(buf, pos)
+                pos += _WAL_NAME.size
+                if pos + size > end:
+                    break
+                names[name_id] = buf[pos:pos + size].decode('utf-8')
+                pos += size
+                continue
             
+            if pos + _WAL_EVENT.size > end:
+                break  # недописанная запись после аварийного завершения
+            op, _, weapon_id, map_id, arg = _WAL_EVENT.unpack_from(buf, pos)
+            pos += _WAL_EVENT.size
+            weapon, map_name = names.get(weapon_id, ''), names.get(map_id, '')
+            
+            if op == _WAL_OP_KILL:
+                self.record_kill(weapon=weapon, headshot=bool(arg), map_name=map_name)
+            elif op == _WAL_OP_DEATH:
+                self.record_death(weapon=weapon, map_name=map_name)
+            elif op == _WAL_OP_ROUND:
+                self.record_round_end(won=bool(arg), map_name=map_name)
+            elif op == _WAL_OP_CLUTCH:
+                self.record_clutch(enemies_killed=arg, map_name=map_name)
+            replayed += 1
+        
+        # Новые записи дописываются к тому же журналу - сохраняем нумерацию имён
+        self._wal_ids = {name: name_id for name_id, name in names.items()}
+        if replayed:
+            logger.info("[STATS] Восстановлено из журнала: %d событий", replayed)
+    
+    def _wal_name_id(self, name: str) -> int:
+        """ID имени в журнале; новое имя сначала записывается в журнал (под lock)"""
+        name_id = self._wal_ids.get(name)
+        if name_id is None:
+            name_id = len(self._wal_ids)
+            self._wal_ids[name] = name_id
+            raw = name.encode('utf-8')
+            self._wal.write(_WAL_NAME.pack(_WAL_OP_NAME, name_id, len(raw)) + raw)
+        return name_id
+    
+    def _log_event(self, op: int, weapon: str = "", map_name: str = "", arg: int = 0,
+                   now: float = None):
+        """Дописать событие в журнал: одна запись фиксированной длины, без JSON (под lock)"""
+        if self._wal is None:
+            return
+        try:
+            if now is None:
+                now = time.time()
+            self._wal.write(_WAL_EVENT.pack(
+                op, now, self._wal_name_id(weapon), self._wal_name_id(map_name), arg
+            ))
+            if now - self._last_flush > _WAL_FLUSH_INTERVAL:
+                self._wal.flush()
+                self._last_flush = now
+        except Exception as e:
+            logger.error(f"Ошибка записи журнала событий: {e}")
+    
+    def _local_counters(self) -> array.array:
+        """Счётчики текущего потока (регистрируются при первом обращении)"""
+        counters = getattr(self._tls, 'counters', None)
+        if counters is None:
+            counters = self._tls.counters = array.array('q', bytes(8 * _C.THREAD_LOCAL))
+            with self._lock:
+                self._tls_counters.append(counters)
+        return counters
+    
+    def _total(self, idx: int) -> int:
+        """База из _counts + сумма частичных счётчиков всех потоков"""
+        if idx >= _C.THREAD_LOCAL:
+            return self._counts[idx]
+        return self._counts[idx] + sum(c[idx] for c in self._tls_counters)
+    
+    def _merged_lifetime_stats(self) -> LifetimeStats:
+        """Полная копия статистики: поля _lifetime + все счётчики"""
+        return replace(self._lifetime, **{name: self._total(idx) for idx, name in enumerate(_COUNTER_FIELDS)})
+    
+    @property
+    def lifetime_stats(self) -> LifetimeStats:
+        """Снимок статистики за всё время (копия, изменения не сохраняются)"""
+        return self._merged_lifetime_stats()
+    
+    def _save_data(self):
+        """Запросить сохранение снимка (не блокирует вызывающий поток)"""
+        try:
+            self._save_q.put_nowait(1)
+        except queue.Full:
+            pass  # снимок уже запрошен и ещё не записан
+    
+    def flush(self):
+        """Дождаться записи всех запрошенных снимков"""
+        self._save_q.join()
+    
+    def _writer_loop(self):
+        """Фоновый поток записи снимков"""
+        while True:
+            self._save_q.get()
+            time.sleep(0.2)
+            drained = 0
+            while True:
+                try:
+                    self._save_q.get_nowait()
+                    drained += 1
+                except queue.Empty:
+                    break
+            try:
+                self._do_save()
+            finally:
+                for _ in range(drained + 1):
+                    self._save_q.task_done()
+    
+    def _do_save(self):
+        """Сохранение данных: один снимок, атомарно через временный файл"""
+        with self._lock:
             try:
-                achievements_file = self.data_dir / "achievements.json"
-                with open(achievements_file, 'w', encoding='utf-8') as f:
-                    data = {}
-                    for ach_id, ach in self.achievements.items():
-                        data[ach_id] = {
+                snapshot = {
+                    'lifetime': self._merged_lifetime_stats(),
+                    'achievements': {
+                        ach_id: {
                             'unlocked': ach.unlocked,
                             'unlocked_at': ach.unlocked_at,
                             'progress': ach.progress
                         }
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"Ошибка сохранения достижений: {e}")
-            
-            try:
-                weapons_file = self.data_dir / "weapon_stats.json"
-                with open(weapons_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.weapon_kills, f, ensure_ascii=False, indent=2)
+                        for ach_id, ach in self.achievements.items()
+                    },
+                    'weapons': self.weapon_kills,
+                    'maps': self.map_stats,
+                }
+                snapshot_file = self.data_dir / "stats.json"
+                tmp_file = self.data_dir / "stats.json.tmp"
+                tmp_file.write_bytes(_json_dumps(snapshot))
+                os.replace(tmp_file, snapshot_file)
             except Exception as e:
-                logger.error(f"Ошибка сохранения статистики оружия: {e}")
+                logger.error(f"Ошибка сохранения статистики: {e}")
+                return
             
-            try:
-                maps_file = self.data_dir / "map_stats.json"
-                with open(maps_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.map_stats, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                logger.error(f"Ошибка сохранения статистики карт: {e}")
+            # Снимок на диске - журнал событий больше не нужен
+            if self._wal is not None:
+                try:
+                    self._wal.seek(0)
+                    self._wal.truncate()
+                    self._wal_ids = {'': 0}
+                except Exception as e:
+                    logger.error(f"Ошибка очистки журнала событий: {e}")
     
     def start_session(self) -> str:
         """
@@ -247,26 +609,30 @@ class StatisticsTracker:
         Returns:
             ID сессии
         """
+        # Одно чтение часов и один strftime: дата - срез от ID сессии
         session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        date = f"{session_id[:4]}-{session_id[4:6]}-{session_id[6:8]}"
         
         self.current_session = SessionStats(
             session_id=session_id,
-            date=datetime.now().strftime("%Y-%m-%d"),
+            date=date,
             duration_minutes=0
         )
         
         self.kill_streak = 0
         self.round_kills = 0
         
-        self.lifetime_stats.total_sessions += 1
+        counts = self._counts
+        counts[_C.SESSIONS] += 1
         
-        if not self.lifetime_stats.first_stream_date:
-            self.lifetime_stats.first_stream_date = datetime.now().strftime("%Y-%m-%d")
+        if not self._lifetime.first_stream_date:
+            self._lifetime.first_stream_date = date
         
-        self._check_achievement("sessions", self.lifetime_stats.total_sessions)
+        self._check_achievement("sessions", counts[_C.SESSIONS])
+        self._version += 1
         
         self._running = True
-        print(f"[STATS] Сессия начата: {session_id}")
+        logger.info("[STATS] Сессия начата: %s", session_id)
         
         return session_id
     
@@ -277,30 +643,32 @@ class StatisticsTracker:
         
         if duration_minutes:
             self.current_session.duration_minutes = duration_minutes
+        # Счётчики минут - целочисленный массив: дробную длительность округляем
+        self.current_session.duration_minutes = round(self.current_session.duration_minutes)
         
-        self.lifetime_stats.total_stream_minutes += self.current_session.duration_minutes
+        counts = self._counts
+        counts[_C.STREAM_MINUTES] += self.current_session.duration_minutes
         
-        if self.current_session.duration_minutes > self.lifetime_stats.longest_session_minutes:
-            self.lifetime_stats.longest_session_minutes = self.current_session.duration_minutes
+        if self.current_session.duration_minutes > counts[_C.LONGEST_SESSION]:
+            counts[_C.LONGEST_SESSION] = self.current_session.duration_minutes
         
-        self._check_achievement("stream_time", self.lifetime_stats.total_stream_minutes)
+        self._check_achievement("stream_time", counts[_C.STREAM_MINUTES])
         
         if self.current_session.deaths > 0:
             kd = self.current_session.kills / self.current_session.deaths
-            if kd > self.lifetime_stats.best_kd_ratio:
-                self.lifetime_stats.best_kd_ratio = round(kd, 2)
-        
-        self._update_favorite_weapon()
-        self._update_favorite_map()
+            if kd > self._lifetime.best_kd_ratio:
+                self._lifetime.best_kd_ratio = round(kd, 2)
         
         self.session_history.append(self.current_session)
         
         self._save_data()
         self._save_session_history()
         
-        print(f"[STATS] Сессия завершена: {self.current_session.kills} убийств, {self.current_session.deaths} смертей")
+        logger.info("[STATS] Сессия завершена: %d убийств, %d смертей",
+                    self.current_session.kills, self.current_session.deaths)
         
         self.current_session = None
+        self._version += 1
         self._running = False
     
     def record_kill(self, weapon: str = "", headshot: bool = False, 
@@ -313,178 +681,280 @@ class StatisticsTracker:
         """
         new_achievements = []
         
+        # Счётчик потока берём до lock (регистрация сама берёт lock), а увеличиваем
+        # под lock вместе с записью в журнал: снимок не увидит событие без записи
+        counters = self._local_counters()
+        
         with self._lock:
-            self.lifetime_stats.total_kills += 1
+            counters[_C.KILLS] += 1
+            if headshot:
+                counters[_C.HEADSHOTS] += 1
+            
+            now = time.time()  # одно чтение часов на событие: и для момента, и для журнала
             self.kill_streak += 1
             self.round_kills += 1
             
             if self.current_session:
                 self.current_session.kills += 1
             
-            if headshot:
-                self.lifetime_stats.total_headshots += 1
-                if self.current_session:
-                    self.current_session.headshots += 1
+            if headshot and self.current_session:
+                self.current_session.headshots += 1
             
             if weapon:
-                self.weapon_kills[weapon] = self.weapon_kills.get(weapon, 0) + 1
+                idx = self._weapon_slot(weapon)
+                count = self._weapon_counts[idx] + 1
+                self._weapon_counts[idx] = count
+                if count > self._fav_weapon[1]:
+                    self._fav_weapon = (weapon, count)
+                    self._lifetime.favorite_weapon = weapon
                 if self.current_session and not self.current_session.best_weapon:
                     self.current_session.best_weapon = weapon
             
             if map_name:
-                if map_name not in self.map_stats:
-                    self.map_stats[map_name] = {'kills': 0, 'deaths': 0, 'rounds': 0}
-                self.map_stats[map_name]['kills'] += 1
+                self._map_counts[self._map_slot(map_name) + _MAP_KILLS] += 1
             
-            if self.kill_streak > self.lifetime_stats.best_kill_streak:
-                self.lifetime_stats.best_kill_streak = self.kill_streak
+            counts = self._counts
+            if self.kill_streak > counts[_C.BEST_KILL_STREAK]:
+                counts[_C.BEST_KILL_STREAK] = self.kill_streak
             
             if self.round_kills == 5:
-                self.lifetime_stats.total_aces += 1
+                counts[_C.ACES] += 1
                 if self.current_session:
                     self.current_session.aces += 1
-                    self.current_session.highlight_moments.append({
-                        'type': 'ace',
-                        'timestamp': time.time(),
-                        'weapon': weapon
-                    })
-                ach = self._check_achievement("aces", self.lifetime_stats.total_aces)
+                    self.current_session.highlight_moments.append(
+                        Highlight('ace', now, weapon, 0))
+                ach = self._check_achievement("aces", counts[_C.ACES])
                 if ach:
                     new_achievements.append(ach)
             
-            ach = self._check_achievement("kills", self.lifetime_stats.total_kills)
+            ach = self._check_achievement("kills", self._total(_C.KILLS))
             if ach:
                 new_achievements.append(ach)
             
             if headshot:
-                ach = self._check_achievement("headshots", self.lifetime_stats.total_headshots)
+                ach = self._check_achievement("headshots", self._total(_C.HEADSHOTS))
                 if ach:
                     new_achievements.append(ach)
-        
-        if self.auto_save and self.lifetime_stats.total_kills % 50 == 0:
-            self._save_data()
+            
+            self._log_event(_WAL_OP_KILL, weapon, map_name, 1 if headshot else 0, now)
+            self._version += 1
         
         return new_achievements
     
     def record_death(self, attacker: str = "", weapon: str = "", map_name: str = ""):
         """Записать смерть"""
+        counters = self._local_counters()
+        
         with self._lock:
-            self.lifetime_stats.total_deaths += 1
+            counters[_C.DEATHS] += 1
             self.kill_streak = 0
             
             if self.current_session:
                 self.current_session.deaths += 1
             
-            if map_name and map_name in self.map_stats:
-                self.map_stats[map_name]['deaths'] += 1
+            base = self._map_idx.get(map_name)
+            if base is not None:
+                self._map_counts[base + _MAP_DEATHS] += 1
+            
+            self._log_event(_WAL_OP_DEATH, weapon, map_name)
+            self._version += 1
     
     def record_round_end(self, won: bool, map_name: str = ""):
         """Записать окончание раунда"""
         with self._lock:
             self.round_kills = 0
             
+            counts = self._counts
             if won:
-                self.lifetime_stats.total_rounds_won += 1
-                self.lifetime_stats.current_win_streak += 1
+                counts[_C.ROUNDS_WON] += 1
+                counts[_C.CURRENT_WIN_STREAK] += 1
                 
-                if self.lifetime_stats.current_win_streak > self.lifetime_stats.best_win_streak:
-                    self.lifetime_stats.best_win_streak = self.lifetime_stats.current_win_streak
+                if counts[_C.CURRENT_WIN_STREAK] > counts[_C.BEST_WIN_STREAK]:
+                    counts[_C.BEST_WIN_STREAK] = counts[_C.CURRENT_WIN_STREAK]
                 
                 if self.current_session:
                     self.current_session.rounds_won += 1
                 
-                self._check_achievement("win_streak", self.lifetime_stats.current_win_streak)
+                self._check_achievement("win_streak", counts[_C.CURRENT_WIN_STREAK])
             else:
-                self.lifetime_stats.total_rounds_lost += 1
-                self.lifetime_stats.current_win_streak = 0
+                counts[_C.ROUNDS_LOST] += 1
+                counts[_C.CURRENT_WIN_STREAK] = 0
                 
                 if self.current_session:
                     self.current_session.rounds_lost += 1
             
             if map_name:
-                if map_name not in self.map_stats:
-                    self.map_stats[map_name] = {'kills': 0, 'deaths': 0, 'rounds': 0}
-                self.map_stats[map_name]['rounds'] += 1
+                pos = self._map_slot(map_name) + _MAP_ROUNDS
+                rounds = self._map_counts[pos] + 1
+                self._map_counts[pos] = rounds
+                if rounds > self._fav_map[1]:
+                    self._fav_map = (map_name, rounds)
+                    self._lifetime.favorite_map = map_name
+            
+            self._log_event(_WAL_OP_ROUND, "", map_name, 1 if won else 0)
+            self._version += 1
     
     def record_clutch(self, enemies_killed: int = 1, map_name: str = "") -> Optional[Achievement]:
         """Записать клатч"""
         with self._lock:
-            self.lifetime_stats.total_clutches += 1
+            now = time.time()
+            self._counts[_C.CLUTCHES] += 1
             
             if self.current_session:
                 self.current_session.clutches += 1
-                self.current_session.highlight_moments.append({
-                    'type': 'clutch',
-                    'timestamp': time.time(),
-                    'enemies': enemies_killed
-                })
+                self.current_session.highlight_moments.append(
+                    Highlight('clutch', now, "", enemies_killed))
+            
+            self._log_event(_WAL_OP_CLUTCH, "", map_name, min(enemies_killed, 255), now)
+            self._version += 1
             
-            return self._check_achievement("clutches", self.lifetime_stats.total_clutches)
+            return self._check_achievement("clutches", self._counts[_C.CLUTCHES])
     
     def _check_achievement(self, achievement_type: str, current_value: int) -> Optional[Achievement]:
         """Проверить и разблокировать достижение"""
-        for ach_id, ach in self.achievements.items():
-            if ach.type == achievement_type and not ach.unlocked:
-                ach.progress = current_value
-                
-                if current_value >= ach.requirement:
-                    ach.unlocked = True
-                    ach.unlocked_at = time.time()
-                    print(f"[STATS] 🏆 Достижение разблокировано: {ach.icon} {ach.name}")
-                    return ach
+        pending = self._by_type.get(achievement_type)
+        if not pending:
+            return None
+        
+        # Прогресс нужен get_next_achievements для всех оставшихся этого типа
+        for ach in pending:
+            ach.progress = current_value
+        
+        # Список отсортирован: достаточно проверить ближайшее требование
+        ach = pending[0]
+        if current_value >= ach.requirement:
+            pending.pop(0)
+            ach.unlocked = True
+            ach.unlocked_at = time.time()
+            logger.info("[STATS] 🏆 Достижение разблокировано: %s %s", ach.icon, ach.name)
+            return ach
         return None
     
+    @property
+    def weapon_kills(self) -> Dict[str, int]:
+        """Убийства по оружию (собирается из массива счётчиков)"""
+        return dict(zip(self._weapon_names, self._weapon_counts))
+    
+    @weapon_kills.setter
+    def weapon_kills(self, data: Dict[str, int]):
+        self._weapon_idx: Dict[str, int] = {}
+        self._weapon_names: List[str] = []
+        self._weapon_counts = array.array('Q')
+        for weapon, count in data.items():
+            # Массив беззнаковый целочисленный: значения из файла округляем, отрицательные - в 0
+            self._weapon_counts[self._weapon_slot(weapon)] = max(0, round(count))
+    
+    @property
+    def map_stats(self) -> Dict[str, Dict[str, int]]:
+        """Статистика по картам (собирается из массива счётчиков)"""
+        counts = self._map_counts
+        return {
+            name: {'kills': counts[base + _MAP_KILLS],
+                   'deaths': counts[base + _MAP_DEATHS],
+                   'rounds': counts[base + _MAP_ROUNDS]}
+            for name, base in self._map_idx.items()
+        }
+    
+    @map_stats.setter
+    def map_stats(self, data: Dict[str, Dict[str, int]]):
+        self._map_idx: Dict[str, int] = {}
+        self._map_counts = array.array('Q')
+        for map_name, stats in data.items():
+            base = self._map_slot(map_name)
+            for offset, name in enumerate(_MAP_FIELDS):
+                self._map_counts[base + offset] = max(0, round(stats.get(name, 0)))
+    
+    def _weapon_slot(self, weapon: str) -> int:
+        """Индекс оружия в _weapon_counts (новое имя интернируется)"""
+        idx = self._weapon_idx.get(weapon)
+        if idx is None:
+            weapon = sys.intern(weapon)
+            idx = self._weapon_idx[weapon] = len(self._weapon_names)
+            self._weapon_names.append(weapon)
+            self._weapon_counts.append(0)
+        return idx
+    
+    def _map_slot(self, map_name: str) -> int:
+        """Смещение первой ячейки карты в _map_counts (новое имя интернируется)"""
+        base = self._map_idx.get(map_name)
+        if base is None:
+            map_name = sys.intern(map_name)
+            base = self._map_idx[map_name] = len(self._map_counts)
+            self._map_counts.extend((0, 0, 0))
+        return base
+    
     def _update_favorite_weapon(self):
-        """Обновить любимое оружие"""
+        """Пересчитать любимое оружие полностью (только при загрузке)"""
         if self.weapon_kills:
-            self.lifetime_stats.favorite_weapon = max(
-                self.weapon_kills, 
-                key=self.weapon_kills.get
-            )
+            weapon = max(self.weapon_kills, key=self.weapon_kills.get)
+            self._fav_weapon = (weapon, self.weapon_kills[weapon])
+            self._lifetime.favorite_weapon = weapon
     
     def _update_favorite_map(self):
-        """Обновить любимую карту"""
+        """Пересчитать любимую карту полностью (только при загрузке)"""
         if self.map_stats:
-            self.lifetime_stats.favorite_map = max(
-                self.map_stats,
-                key=lambda m: self.map_stats[m].get('rounds', 0)
-            )
+            map_name = max(self.map_stats, key=lambda m: self.map_stats[m].get('rounds', 0))
+            self._fav_map = (map_name, self.map_stats[map_name].get('rounds', 0))
+            self._lifetime.favorite_map = map_name
+    
+    def _load_session_history(self):
+        """Загрузить историю сессий (mmap: без промежуточной копии файла)"""
+        history_file = self.data_dir / "session_history.json"
+        try:
+            if not history_file.exists() or history_file.stat().st_size == 0:
+                return
+            with open(history_file, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if orjson is not None:
+                        # orjson читает memoryview напрямую, без копии в bytes
+                        with memoryview(mm) as view:
+                            data = orjson.loads(view)
+                    else:
+                        data = _json_loads(mm[:])
+            self.session_history = SessionHistory.from_columns(data)
+            logger.info("[STATS] Загружена история: %d сессий", len(self.session_history))
+        except Exception as e:
+            logger.error(f"Ошибка загрузки истории сессий: {e}")
     
     def _save_session_history(self):
         """Сохранить историю сессий"""
         try:
             history_file = self.data_dir / "session_history.json"
             
-            recent_sessions = self.session_history[-100:]
-            data = [asdict(s) for s in recent_sessions]
-            
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Колонки без повторения имён полей в каждой записи
+            with open(history_file, 'wb') as f:
+                f.write(_json_dumps(self.session_history.to_columns()))
         except Exception as e:
             logger.error(f"Ошибка сохранения истории сессий: {e}")
     
     def get_lifetime_summary(self) -> Dict[str, Any]:
-        """Получить сводку статистики за все время"""
-        return {
-            'total_sessions': self.lifetime_stats.total_sessions,
-            'total_hours': round(self.lifetime_stats.total_stream_minutes / 60, 1),
-            'total_kills': self.lifetime_stats.total_kills,
-            'total_deaths': self.lifetime_stats.total_deaths,
-            'kd_ratio': round(
-                self.lifetime_stats.total_kills / max(1, self.lifetime_stats.total_deaths), 2
-            ),
-            'total_headshots': self.lifetime_stats.total_headshots,
-            'headshot_percent': round(
-                self.lifetime_stats.total_headshots / max(1, self.lifetime_stats.total_kills) * 100, 1
-            ),
-            'total_aces': self.lifetime_stats.total_aces,
-            'total_clutches': self.lifetime_stats.total_clutches,
-            'best_kill_streak': self.lifetime_stats.best_kill_streak,
-            'best_win_streak': self.lifetime_stats.best_win_streak,
-            'favorite_weapon': self.lifetime_stats.favorite_weapon,
-            'favorite_map': self.lifetime_stats.favorite_map,
-            'first_stream': self.lifetime_stats.first_stream_date,
+        """Получить сводку статистики за все время (кэш до следующей записи)"""
+        version = self._version
+        if self._summary_cache is not None and self._summary_cache[0] == version:
+            return dict(self._summary_cache[1])
+        
+        counts = self._counts
+        kills = self._total(_C.KILLS)
+        deaths = self._total(_C.DEATHS)
+        headshots = self._total(_C.HEADSHOTS)
+        summary = {
+            'total_sessions': counts[_C.SESSIONS],
+            'total_hours': round(counts[_C.STREAM_MINUTES] / 60, 1),
+            'total_kills': kills,
+            'total_deaths': deaths,
+            'kd_ratio': round(kills / max(1, deaths), 2),
+            'total_headshots': headshots,
+            'headshot_percent': round(headshots / max(1, kills) * 100, 1),
+            'total_aces': counts[_C.ACES],
+            'total_clutches': counts[_C.CLUTCHES],
+            'best_kill_streak': counts[_C.BEST_KILL_STREAK],
+            'best_win_streak': counts[_C.BEST_WIN_STREAK],
+            'favorite_weapon': self._lifetime.favorite_weapon,
+            'favorite_map': self._lifetime.favorite_map,
+            'first_stream': self._lifetime.first_stream_date,
         }
+        self._summary_cache = (version, summary)
+        return dict(summary)
     
     def get_unlocked_achievements(self) -> List[Achievement]:
         """Получить разблокированные достижения"""
@@ -497,40 +967,36 @@ class StatisticsTracker:
         Returns:
             Список (достижение, прогресс в процентах)
         """
-        locked = [a for a in self.achievements.values() if not a.unlocked]
-        
-        with_progress = []
-        for ach in locked:
-            progress_percent = min(100, (ach.progress / ach.requirement) * 100)
-            with_progress.append((ach, progress_percent))
-        
-        with_progress.sort(key=lambda x: x[1], reverse=True)
-        return with_progress[:limit]
+        # Частичный отбор top-limit без сортировки всего списка
+        return heapq.nlargest(
+            limit,
+            ((ach, min(100, (ach.progress / ach.requirement) * 100))
+             for ach in self.achievements.values() if not ach.unlocked),
+            key=lambda x: x[1]
+        )
     
     def format_stats_message(self) -> str:
         """Сформировать текстовое сообщение со статистикой"""
         stats = self.get_lifetime_summary()
+        unlocked = len(self.get_unlocked_achievements())
         
-        message = f"""📊 Твоя статистика за всё время:
-
-🎯 Убийств: {stats['total_kills']} (K/D: {stats['kd_ratio']})
-💀 Смертей: {stats['total_deaths']}
-🎯 Хедшотов: {stats['total_headshots']} ({stats['headshot_percent']}%)
-♠️ Эйсов: {stats['total_aces']}
-💪 Клатчей: {stats['total_clutches']}
-🔥 Лучшая серия: {stats['best_kill_streak']} убийств
-
-⏱️ Время стримов: {stats['total_hours']} часов
-📺 Сессий: {stats['total_sessions']}
-🗺️ Любимая карта: {stats['favorite_map'] or 'Пока нет'}
-🔫 Любимое оружие: {stats['favorite_weapon'] or 'Пока нет'}
-
-🏆 Достижений: {len(self.get_unlocked_achievements())}/{len(self.achievements)}"""
+        # Оверлей может дёргать метод часто - при тех же данных отдаём готовую строку
+        key = (tuple(stats.values()), unlocked)
+        if self._stats_message is not None and self._stats_message[0] == key:
+            return self._stats_message[1]
         
+        message = self._STATS_TEMPLATE.format_map(dict(
+            stats,
+            favorite_map=stats['favorite_map'] or 'Пока нет',
+            favorite_weapon=stats['favorite_weapon'] or 'Пока нет',
+            unlocked=unlocked,
+            achievements_total=len(self.achievements),
+        ))
+        self._stats_message = (key, message)
         return message
 
-
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("=== Тест системы статистики Ирис ===\n")
     
     tracker = StatisticsTracker()
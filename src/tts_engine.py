@@ -5,12 +5,18 @@ IRIS TTS Engine v3.1 - Эмоциональный голос с приорити
 """
 
 import asyncio
+import concurrent.futures
+import hashlib
+import io
+import math
 import threading
-import queue
 import time
 import os
-import tempfile
-from typing import Optional, Callable, Dict, Any, Tuple
+import re
+from collections import OrderedDict, deque
+from itertools import chain, islice
+from pathlib import Path
+from typing import Optional, Callable, Dict, Any, List, Tuple
 from enum import Enum
 
 try:
@@ -27,6 +33,11 @@ except ImportError:
     PYGAME_AVAILABLE = False
     print("[TTS] Pygame не установлен. Установите: pip install pygame")
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 class EmotionType(Enum):
     NEUTRAL = "neutral"
     HAPPY = "happy"
@@ -39,6 +50,55 @@ class EmotionType(Enum):
     PROUD = "proud"
     ENCOURAGING = "encouraging"
 
+_EMOTION_VALUES = frozenset(e.value for e in EmotionType)
+
+# Ключевые слова в порядке приоритета: (эмоция, слова)
+_EMOTION_KEYWORDS = (
+    ('excited', ('невероятно', 'потрясающе', 'вау', 'офигеть', 'эйс', 'ace', 'клатч')),
+    ('happy', ('круто', 'отлично', 'прекрасно', 'здорово', 'супер', 'класс', 'молодец', 'ура')),
+    ('supportive', ('ничего', 'бывает', 'не переживай', 'справишься', 'в следующий раз')),
+    ('gentle', ('жаль', 'обидно', 'к сожалению', 'увы')),  # грусть озвучиваем мягко
+)
+
+
+def _build_emotion_automaton():
+    """Автомат Aho-Corasick по всем ключевым словам: слово -> ранг эмоции"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for rank, (_, words) in enumerate(_EMOTION_KEYWORDS):
+        for word in words:
+            if word not in automaton:  # при повторе остаётся высший приоритет
+                automaton.add_word(word, rank)
+    automaton.make_automaton()
+    return automaton
+
+
+_EMOTION_AUTOMATON = _build_emotion_automaton()
+
+# Без ahocorasick - одна regex-альтернация по всем словам. Lookahead находит
+# совпадения с каждой позиции (в том числе перекрывающиеся), а порядок
+# альтернатив по приоритету даёт лучшее слово для позиции
+_EMOTION_WORD_RANK: Dict[str, int] = {}
+for _rank, (_, _words) in enumerate(_EMOTION_KEYWORDS):
+    for _word in _words:
+        _EMOTION_WORD_RANK.setdefault(_word, _rank)
+_EMOTION_RE = re.compile('(?=(' + '|'.join(map(re.escape, _EMOTION_WORD_RANK)) + '))')
+
+# Эмоция по игровому событию из контекста: строка или функция от контекста
+_EVENT_EMOTION: Dict[str, Any] = {
+    'kill': lambda ctx: 'excited' if ctx.get('headshot') else 'happy',
+    'death': 'supportive',
+    'round_win': 'proud',
+    'round_loss': 'encouraging',
+    'ace': 'excited',
+    'clutch': 'excited',
+}
+
+# Интенсивность визуализации во время речи: синусоида 0.5..0.8 с периодом 1с,
+# индекс берётся из монотонных часов (30 шагов в секунду)
+_INTENSITY_LUT = tuple(0.65 + 0.15 * math.sin(i * math.pi / 15) for i in range(30))
+
 class TTSEngine:
     """
     Эмоциональный движок синтеза речи для Ирис
@@ -66,6 +126,17 @@ class TTSEngine:
         'encouraging': {'rate': '+5%', 'pitch': '+10Hz', 'volume': '+5%'},
     }
 
+    # Кэш синтезированных фраз: в памяти (LRU) и на диске для коротких реплик
+    CACHE_SIZE = 256
+    CACHE_MAX_TEXT = 80  # длинные уникальные ответы на диск не пишем
+    CACHE_DIR = Path.home() / ".cache" / "iris_tts"
+    CACHE_DISK_MAX_FILES = 1000  # сверх лимита удаляются давно не звучавшие (по mtime)
+    CACHE_DISK_EVICT_TO = 0.9    # чистим с запасом, чтобы не сканировать папку на каждой записи
+
+    # Сколько фраз синтезируется параллельно (очередь озвучивается строго по порядку)
+    SYNTH_CONCURRENCY = 3
+    MIXER_BUFFERS = (512, 1024, 2048)  # размеры буфера mixer в порядке попыток
+
     EMOTION_PHRASES = {
         'happy': ['Ура!', 'Отлично!', 'Прекрасно!', 'Супер!'],
         'excited': ['Вау!', 'Невероятно!', 'Потрясающе!'],
@@ -101,20 +172,40 @@ class TTSEngine:
         self.base_rate = rate
         self.base_volume = volume
         self.visual_callback = visual_callback
+        self._build_emotion_params()
         
-        # ✅ НОВОЕ: Приоритетная очередь с max_queue_size
-        self.message_queue = queue.PriorityQueue(maxsize=max_queue_size)
+        # ✅ НОВОЕ: Две очереди (приоритетная и обычная) вместо кучи с lock:
+        # классов приоритета всего два, append/popleft у deque атомарны
+        self._high: deque = deque()
+        self._low: deque = deque()
+        self._wake = threading.Event()
+        # Сообщений в очереди + озвучиваемое сейчас; _idle_event установлен, когда 0
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        self._idle_event = threading.Event()
+        self._idle_event.set()
         self.max_queue_size = max_queue_size
         
         self.is_running = False
         self.currently_speaking = False
         self.current_emotion = EmotionType.NEUTRAL
         self.processing_thread = None
-        self._message_counter = 0
-        self.temp_files = []
+        # Один event loop на всё время работы: соединения edge-tts переиспользуются
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        # (voice_id, rate, pitch, emotion, text) -> декодированный Sound (MP3 лежит на диске);
+        # трогается только из потока loop
+        self._cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._disk_files: Optional[int] = None  # число MP3 в CACHE_DIR (считается при первой записи)
+        # Синтез ближайших элементов очереди, запущенный заранее: [(элемент, future)]
+        self._prefetched: List[Tuple[tuple, concurrent.futures.Future]] = []
+        # Синтез фразы, которую ждёт обработчик (stop() отменяет его до остановки loop)
+        self._current_synth: Optional[concurrent.futures.Future] = None
+        self._synth_limit: Optional[asyncio.Semaphore] = None
+        self._pending_synth: Dict[tuple, asyncio.Future] = {}  # ключ кэша -> идущий запрос
         
-        # ✅ НОВОЕ: Флаг для прерывания текущей речи
-        self._interrupt_flag = False
+        # ✅ НОВОЕ: Сигнал прерывания текущей речи (будит цикл воспроизведения сразу)
+        self._interrupt_event = threading.Event()
         
         # ✅ НОВОЕ: Event для синхронизации
         self._speaking_done = threading.Event()
@@ -127,9 +218,20 @@ class TTSEngine:
     def _init_pygame(self):
         """Безопасная инициализация pygame mixer"""
         self.audio_available = False
+        self._channel = None
         try:
             if pygame.mixer.get_init() is None:
-                pygame.mixer.init(frequency=24000, size=-16, channels=1, buffer=2048)
+                # Буфер 512 кадров - ~21мс до звука и на реакцию на прерывание
+                # (2048 давали ~85мс); на системах с джиттером берём буфер побольше
+                for buffer in self.MIXER_BUFFERS[:-1]:
+                    try:
+                        pygame.mixer.init(frequency=24000, size=-16, channels=1, buffer=buffer)
+                        break
+                    except pygame.error as e:
+                        print(f"[TTS] Буфер {buffer} не поддерживается: {e}")
+                else:
+                    pygame.mixer.init(frequency=24000, size=-16, channels=1,
+                                      buffer=self.MIXER_BUFFERS[-1])
             self.audio_available = True
             print("[TTS] Pygame mixer инициализирован")
         except Exception as e:
@@ -142,59 +244,84 @@ class TTSEngine:
             except:
                 self.audio_available = False
 
+        if self.audio_available:
+            # Канал 0 зарезервирован под речь: Sound на своём канале
+            # останавливается мгновенно и не требует load/unload на каждую фразу
+            pygame.mixer.set_num_channels(2)
+            pygame.mixer.set_reserved(1)
+            self._channel = pygame.mixer.Channel(0)
+
     def _get_voice_id(self) -> str:
         """Получение ID голоса Edge TTS"""
         if self.voice_preset in self.VOICE_PRESETS:
             return self.VOICE_PRESETS[self.voice_preset]
         return self.VOICE_PRESETS['ru_female_soft']
 
-    def _build_ssml(self, text: str, emotion: str) -> str:
+    def _build_emotion_params(self):
         """
-        Построение SSML разметки для эмоциональной речи
-        Args:
-            text: Исходный текст
-            emotion: Тип эмоции
-        Returns:
-            SSML строка с эмоциональной разметкой
+        Параметры голоса для каждой эмоции: (rate, pitch, volume)
+        SSML собирает сам edge_tts из rate/pitch - своего шаблона не держим
         """
-        voice_id = self._get_voice_id()
-        params = self.EMOTION_SSML_PARAMS.get(emotion, self.EMOTION_SSML_PARAMS['neutral'])
-        
-        ssml = f'''<speak version="1.0" xml:lang="ru-RU">
-<voice name="{voice_id}" rate="{params['rate']}" pitch="{params['pitch']}">
-{self._add_pauses(text, emotion)}
-</voice>
-</speak>'''
-        return ssml
-
-    def _add_pauses(self, text: str, emotion: str) -> str:
-        """Добавление естественных пауз в текст"""
-        import re
-        text = re.sub(r'([.!?])\s+', r'\1', text)
-        text = re.sub(r'([,;:])\s+', r'\1', text)
-        if emotion in ['happy', 'excited', 'proud']:
-            text = re.sub(r'!', r'!', text)
-        return text
-
-    async def _synthesize_async(self, text: str, emotion: str = 'neutral') -> Optional[str]:
+        self._emotion_params: Dict[str, Tuple[str, str, str]] = {
+            emotion: (params['rate'], params['pitch'], params['volume'])
+            for emotion, params in self.EMOTION_SSML_PARAMS.items()
+        }
+
+    def _prepare_text(self, text: str, emotion: str) -> Optional[Tuple[str, str, str, str]]:
         """
-        Асинхронный синтез речи с Edge TTS
+        Единственная подготовка фразы к синтезу
         Returns:
-            Путь к временному аудиофайлу или None
+            (текст, rate, pitch, volume) или None для пустого текста
         """
         if not text or not isinstance(text, str):
             return None
-
         text = text.strip()
         if not text:
             return None
+        rate, pitch, volume = self._emotion_params.get(emotion, self._emotion_params['neutral'])
+        return text, rate, pitch, volume
+
+    async def _synthesize_async(self, text: str, emotion: str = 'neutral') -> Optional[Any]:
+        """
+        Асинхронный синтез речи с Edge TTS
+        Аудио собирается из потока чанков прямо в память, без временного файла,
+        и декодируется один раз - повтор фразы не платит за разбор MP3
+        Returns:
+            Готовый к воспроизведению Sound (MP3-байты без аудио) или None
+        """
+        prepared = self._prepare_text(text, emotion)
+        if prepared is None:
+            return None
+        text, rate, pitch, _ = prepared
 
         try:
             voice_id = self._get_voice_id()
-            params = self.EMOTION_SSML_PARAMS.get(emotion, self.EMOTION_SSML_PARAMS['neutral'])
-            rate = params['rate']
-            pitch = params['pitch']
+            key = (voice_id, rate, pitch, emotion, text)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+            # Одинаковые фразы, синтезируемые параллельно, ждут один запрос;
+            # shield - отмена одного ожидающего не отменяет общий запрос
+            task = self._pending_synth.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch_audio(key))
+                self._pending_synth[key] = task
+                task.add_done_callback(lambda _: self._pending_synth.pop(key, None))
+            return await asyncio.shield(task)
+
+        except Exception as e:
+            print(f"[TTS] Ошибка синтеза: {e}")
+            return None
+
+    async def _fetch_audio(self, key: tuple) -> Optional[Any]:
+        """Запрос к Edge TTS (не больше SYNTH_CONCURRENCY одновременно)"""
+        voice_id, rate, pitch, _, text = key
+        if self._synth_limit is None:
+            # Создаём в потоке loop: до Python 3.10 семафор привязывается к текущему loop
+            self._synth_limit = asyncio.Semaphore(self.SYNTH_CONCURRENCY)
 
+        async with self._synth_limit:
             communicate = edge_tts.Communicate(
                 text=text,
                 voice=voice_id,
@@ -202,63 +329,144 @@ class TTSEngine:
                 pitch=pitch
             )
 
-            tmp_file = tempfile.NamedTemporaryFile(
-                suffix='.mp3',
-                delete=False,
-                prefix='iris_tts_'
-            )
+            buffer = bytearray()
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    buffer.extend(chunk["data"])
 
-            tmp_path = tmp_file.name
-            tmp_file.close()
+        if not buffer:
+            return None
+        audio = bytes(buffer)
+        sound = self._decode(audio)
+        self._cache_put(key, audio, sound)
+        return sound
+
+    def _decode(self, data: bytes) -> Any:
+        """Декодировать MP3 в PCM (pygame Sound); без аудио - оставить байты"""
+        if not self.audio_available:
+            return data
+        return pygame.mixer.Sound(io.BytesIO(data))
+
+    def _cache_path(self, key: tuple) -> Path:
+        """Файл фразы в дисковом кэше"""
+        return self.CACHE_DIR / (hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.mp3')
+
+    def _cache_get(self, key: tuple) -> Optional[Any]:
+        """Аудио фразы из кэша: сначала память, затем диск (декодируется при чтении)"""
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+            return data
+
+        if len(key[-1]) > self.CACHE_MAX_TEXT:
+            return None
+        path = self._cache_path(key)
+        try:
+            sound = self._decode(path.read_bytes())
+        except Exception:  # нет файла или битый MP3
+            return None
+        try:
+            os.utime(path)  # mtime = последнее использование (LRU для вытеснения)
+        except OSError:
+            pass
+        self._remember(key, sound)
+        return sound
+
+    def _cache_put(self, key: tuple, data: bytes, sound: Any):
+        """
+        Запомнить синтезированную фразу: декодированную - в памяти, MP3 - на диске
+        Длинные фразы не кэшируются вовсе - PCM в ~10 раз больше MP3
+        """
+        if len(key[-1]) > self.CACHE_MAX_TEXT:
+            return
+        self._remember(key, sound)
+        try:
+            self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            path = self._cache_path(key)
+            is_new = not path.exists()
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+            if self._disk_files is None:
+                self._disk_files = sum(1 for _ in self.CACHE_DIR.glob('*.mp3'))
+            elif is_new:
+                self._disk_files += 1
+            if self._disk_files > self.CACHE_DISK_MAX_FILES:
+                self._evict_disk_cache()
+        except OSError as e:
+            print(f"[TTS] Не удалось сохранить фразу в кэш: {e}")
+
+    def _evict_disk_cache(self):
+        """Удалить самые давно использованные MP3, оставив CACHE_DISK_EVICT_TO от лимита"""
+        files = []
+        for path in self.CACHE_DIR.glob('*.mp3'):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                pass
+        files.sort()
+        keep = int(self.CACHE_DISK_MAX_FILES * self.CACHE_DISK_EVICT_TO)
+        removed = 0
+        for _, path in files[:max(0, len(files) - keep)]:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._disk_files = len(files) - removed
 
-            await communicate.save(tmp_path)
-            self.temp_files.append(tmp_path)
-            return tmp_path
+    def _remember(self, key: tuple, sound: Any):
+        """Положить в LRU в памяти, вытесняя самую давнюю фразу"""
+        self._cache[key] = sound
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
 
+    async def _warmup(self):
+        """
+        Прогрев соединения: DNS, TLS и рукопожатие WebSocket
+        оплачиваются при запуске, а не на первой фразе
+        """
+        try:
+            stream = edge_tts.Communicate(".", self._get_voice_id()).stream()
+            async for _ in stream:
+                break
+            await stream.aclose()
         except Exception as e:
-            print(f"[TTS] Ошибка синтеза: {e}")
-            return None
+            print(f"[TTS] Прогрев соединения не удался: {e}")
 
-    def _play_audio(self, audio_path: str) -> bool:
+    def _play_audio(self, sound: Any) -> bool:
         """
-        Воспроизведение аудиофайла через pygame
+        Воспроизведение аудио из памяти через pygame
         Args:
-            audio_path: Путь к аудиофайлу
+            sound: декодированный pygame Sound
         Returns:
             True если успешно
         """
-        if not audio_path or not os.path.exists(audio_path):
-            print("[TTS] Аудиофайл не найден")
+        if sound is None:
+            print("[TTS] Нет аудио для воспроизведения")
             return False
 
         try:
             if self.visual_callback:
                 self.visual_callback(True, 0.8)
 
-            pygame.mixer.music.load(audio_path)
-            pygame.mixer.music.set_volume(self.base_volume)
-            pygame.mixer.music.play()
+            sound.set_volume(self.base_volume)
+            self._channel.play(sound)
 
-            # ✅ НОВОЕ: Проверка флага прерывания во время воспроизведения
-            while pygame.mixer.music.get_busy():
-                if self._interrupt_flag:
-                    pygame.mixer.music.stop()
+            # ✅ НОВОЕ: Ждём сигнала прерывания, а не спим тик Clock -
+            # interrupt() срабатывает сразу, а не через ~33мс
+            while self._channel.get_busy():
+                if self._interrupt_event.wait(timeout=0.02):
+                    self._channel.stop()
                     print("[TTS] ⚠️ Воспроизведение прервано")
                     break
-                
-                pygame.time.Clock().tick(30)
 
                 if self.visual_callback:
-                    import random
-                    intensity = 0.5 + random.random() * 0.3
-                    self.visual_callback(True, intensity)
+                    self.visual_callback(True, _INTENSITY_LUT[int(time.monotonic() * 30) % 30])
 
-            pygame.mixer.music.stop()
-            
-            try:
-                pygame.mixer.music.unload()
-            except:
-                pass
+            self._channel.stop()
 
             if self.visual_callback:
                 self.visual_callback(False, 0.0)
@@ -271,14 +479,76 @@ class TTSEngine:
                 self.visual_callback(False, 0.0)
             return False
 
-        finally:
-            try:
-                if audio_path in self.temp_files:
-                    self.temp_files.remove(audio_path)
-                if os.path.exists(audio_path):
-                    os.unlink(audio_path)
-            except:
-                pass
+    def _add_inflight(self, delta: int):
+        """Изменить счётчик незавершённых сообщений"""
+        with self._inflight_lock:
+            self._inflight += delta
+            if self._inflight > 0:
+                self._idle_event.clear()
+            else:
+                self._idle_event.set()
+
+    def _drain_queue(self) -> int:
+        """
+        Вынуть все ожидающие сообщения; возвращает их число
+        (popleft, а не clear - каждое сообщение списывается ровно один раз)
+        """
+        count = 0
+        while self._pop_next() is not None:
+            count += 1
+        if count:
+            self._add_inflight(-count)
+        return count
+
+    def _pop_next(self) -> Optional[Tuple[str, str]]:
+        """Следующее сообщение: сначала приоритетные"""
+        try:
+            return self._high.popleft() if self._high else self._low.popleft()
+        except IndexError:
+            return None
+
+    def _submit_synthesis(self, item: Tuple[str, str]) -> concurrent.futures.Future:
+        """Отправить синтез элемента в event loop"""
+        return asyncio.run_coroutine_threadsafe(self._synthesize_async(*item), self._loop)
+
+    def _take_prefetched(self, item: Tuple[str, str]) -> Optional[concurrent.futures.Future]:
+        """Забрать заранее запущенный синтез элемента (сравнение по identity)"""
+        for i, (prefetched_item, future) in enumerate(self._prefetched):
+            if prefetched_item is item:
+                del self._prefetched[i]
+                return future
+        return None
+
+    def _synthesis_future(self, item: Tuple[str, str]) -> concurrent.futures.Future:
+        """Синтез элемента очереди: берём заранее запущенный, если он есть"""
+        return self._take_prefetched(item) or self._submit_synthesis(item)
+
+    def _prefetch_next(self):
+        """
+        Запустить синтез ближайших SYNTH_CONCURRENCY элементов, пока текущий
+        воспроизводится; синтез элементов, выпавших из окна, отменяется
+        """
+        try:
+            upcoming = list(islice(chain(self._high, self._low), self.SYNTH_CONCURRENCY))
+        except RuntimeError:
+            return  # очередь изменилась во время обхода - догоним на следующей фразе
+
+        kept = []
+        for item, future in self._prefetched:
+            if any(item is u for u in upcoming):
+                kept.append((item, future))
+            else:
+                future.cancel()
+        for item in upcoming:
+            if not any(item is k for k, _ in kept):
+                kept.append((item, self._submit_synthesis(item)))
+        self._prefetched = kept
+
+    def _cancel_prefetch(self):
+        """Отменить заранее запущенный синтез (очередь очищена или движок остановлен)"""
+        prefetched, self._prefetched = self._prefetched, []
+        for _, future in prefetched:
+            future.cancel()
 
     def _process_queue(self):
         """Основной цикл обработки очереди"""
@@ -286,34 +556,42 @@ class TTSEngine:
         
         while self.is_running:
             try:
-                # ✅ НОВОЕ: Используем timeout для проверки флага
-                try:
-                    priority, counter, (text, emotion) = self.message_queue.get(timeout=0.5)
-                except queue.Empty:
+                # ✅ НОВОЕ: Сбрасываем сигнал до извлечения - добавленное после
+                # сообщение разбудит wait сразу; timeout для проверки флага
+                self._wake.clear()
+                item = self._pop_next()
+                if item is None:
+                    self._wake.wait(timeout=0.5)
                     continue
+                text, emotion = item
 
                 # ✅ НОВОЕ: Проверка флага прерывания перед обработкой
-                if self._interrupt_flag:
-                    self.message_queue.task_done()
+                if self._interrupt_event.is_set():
+                    future = self._take_prefetched(item)
+                    if future is not None:
+                        future.cancel()
+                    self._add_inflight(-1)
                     continue
 
                 self.currently_speaking = True
                 self._speaking_done.clear()
 
-                self.current_emotion = EmotionType(emotion) if emotion in [e.value for e in EmotionType] else EmotionType.NEUTRAL
+                self.current_emotion = EmotionType(emotion) if emotion in _EMOTION_VALUES else EmotionType.NEUTRAL
 
                 try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
-                    audio_path = loop.run_until_complete(
-                        self._synthesize_async(text, emotion)
-                    )
-                    loop.close()
-
-                    if audio_path:
+                    future = self._current_synth = self._synthesis_future(item)
+                    # Сеть простаивает, пока фраза синтезируется и играет - готовим следующие
+                    self._prefetch_next()
+                    try:
+                        audio = future.result()
+                    except concurrent.futures.CancelledError:
+                        audio = None  # движок остановлен или фраза отменена
+                    finally:
+                        self._current_synth = None
+
+                    if audio is not None:
                         if self.audio_available:
-                            success = self._play_audio(audio_path)
+                            success = self._play_audio(audio)
                             if success:
                                 print(f"[TTS] ✅ Озвучено: '{text[:40]}...' [{emotion}]")
                             else:
@@ -321,19 +599,13 @@ class TTSEngine:
                         else:
                             print(f"[TTS] 💬 [{emotion.upper()}]: {text}")
 
-                        try:
-                            if os.path.exists(audio_path):
-                                os.unlink(audio_path)
-                        except:
-                            pass
-
                 except Exception as e:
                     print(f"[TTS] Ошибка обработки: {e}")
 
                 finally:
                     self.currently_speaking = False
                     self._speaking_done.set()  # ✅ НОВОЕ: Сигнал о завершении
-                    self.message_queue.task_done()
+                    self._add_inflight(-1)
 
             except Exception as e:
                 print(f"[TTS] Ошибка в цикле: {e}")
@@ -358,20 +630,15 @@ class TTSEngine:
         if emotion not in self.EMOTION_SSML_PARAMS:
             emotion = 'neutral'
 
-        message_priority = 0 if priority else 1
-        self._message_counter += 1
-        counter = self._message_counter
-
         try:
             # ✅ НОВОЕ: Обработка переполнения очереди
-            try:
-                self.message_queue.put(
-                    (message_priority, counter, (text, emotion)),
-                    block=False
-                )
-            except queue.Full:
+            if len(self._high) + len(self._low) >= self.max_queue_size:
                 print(f"[TTS] ⚠️ Очередь переполнена ({self.max_queue_size}), пропускаем сообщение")
                 return
+            # Счётчик растёт до append: обработчик не спишет сообщение раньше
+            self._add_inflight(1)
+            (self._high if priority else self._low).append((text, emotion))
+            self._wake.set()
 
             if not self.is_running:
                 print("[TTS] Внимание: движок не запущен, вызовите start()")
@@ -393,40 +660,36 @@ class TTSEngine:
         """Автоматическое определение эмоции по тексту и контексту"""
         text_lower = text.lower()
 
-        happy_words = ['круто', 'отлично', 'прекрасно', 'здорово', 'супер', 'класс', 'молодец', 'ура']
-        excited_words = ['невероятно', 'потрясающе', 'вау', 'офигеть', 'эйс', 'ace', 'клатч']
-        supportive_words = ['ничего', 'бывает', 'не переживай', 'справишься', 'в следующий раз']
-        sad_words = ['жаль', 'обидно', 'к сожалению', 'увы']
-
-        if any(word in text_lower for word in excited_words):
-            return 'excited'
-        if any(word in text_lower for word in happy_words):
-            return 'happy'
-        if any(word in text_lower for word in supportive_words):
-            return 'supportive'
-        if any(word in text_lower for word in sad_words):
-            return 'gentle'
+        if _EMOTION_AUTOMATON is not None:
+            # Один проход по тексту; побеждает эмоция с высшим приоритетом
+            best = None
+            for _, rank in _EMOTION_AUTOMATON.iter(text_lower):
+                if best is None or rank < best:
+                    best = rank
+                    if rank == 0:
+                        break
+            if best is not None:
+                return _EMOTION_KEYWORDS[best][0]
+        else:
+            ranks = [_EMOTION_WORD_RANK[m.group(1)] for m in _EMOTION_RE.finditer(text_lower)]
+            if ranks:
+                return _EMOTION_KEYWORDS[min(ranks)][0]
 
         if context:
-            event_type = context.get('event_type', '')
-            if event_type == 'kill':
-                return 'excited' if context.get('headshot') else 'happy'
-            elif event_type == 'death':
-                return 'supportive'
-            elif event_type == 'round_win':
-                return 'proud'
-            elif event_type == 'round_loss':
-                return 'encouraging'
-            elif event_type == 'ace':
-                return 'excited'
-            elif event_type == 'clutch':
-                return 'excited'
+            handler = _EVENT_EMOTION.get(context.get('event_type', ''))
+            if handler:
+                return handler(context) if callable(handler) else handler
 
         return 'neutral'
 
     def is_busy(self) -> bool:
         """Проверка занятости движка"""
-        return self.currently_speaking or not self.message_queue.empty()
+        return self._inflight > 0
+
+    @property
+    def speaking_done(self) -> threading.Event:
+        """Event, установленный когда текущая фраза договорена"""
+        return self._speaking_done
 
     # ✅ НОВЫЕ МЕТОДЫ ДЛЯ СИНХРОНИЗАЦИИ
 
@@ -436,20 +699,18 @@ class TTSEngine:
         ВАЖНО: Не очищает очередь, только текущее сообщение
         """
         if self.currently_speaking:
-            self._interrupt_flag = True
+            self._interrupt_event.set()
             print("[TTS] 🛑 Прерывание текущей речи...")
             
             try:
-                pygame.mixer.music.stop()
+                self._channel.stop()
             except:
                 pass
             
             # Ожидаем завершения
-            timeout = time.time() + 1.0
-            while self.currently_speaking and time.time() < timeout:
-                time.sleep(0.05)
+            self._speaking_done.wait(timeout=1.0)
             
-            self._interrupt_flag = False
+            self._interrupt_event.clear()
 
     def flush(self):
         """
@@ -457,14 +718,8 @@ class TTSEngine:
         """
         self.interrupt()  # Сначала прерываем текущее
         
-        cleared_count = 0
-        while not self.message_queue.empty():
-            try:
-                self.message_queue.get_nowait()
-                self.message_queue.task_done()
-                cleared_count += 1
-            except queue.Empty:
-                break
+        self._cancel_prefetch()
+        cleared_count = self._drain_queue()
         
         if cleared_count > 0:
             print(f"[TTS] 🧹 Очищено {cleared_count} сообщений из очереди")
@@ -477,25 +732,17 @@ class TTSEngine:
         Returns:
             True если система молчит, False если timeout
         """
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            if not self.is_busy():
-                print("[TTS] ✅ Система молчит")
-                return True
-            time.sleep(0.1)
+        if self._idle_event.wait(timeout):
+            print("[TTS] ✅ Система молчит")
+            return True
         
         print(f"[TTS] ⚠️ Timeout: система не замолчала за {timeout}с")
         return False
 
     def clear_queue(self):
         """Очистка очереди (без прерывания текущего)"""
-        while not self.message_queue.empty():
-            try:
-                self.message_queue.get_nowait()
-                self.message_queue.task_done()
-            except queue.Empty:
-                break
+        self._cancel_prefetch()
+        self._drain_queue()
 
     def start(self):
         """Запуск движка TTS"""
@@ -503,6 +750,17 @@ class TTSEngine:
             return
 
         self.is_running = True
+        self._loop = asyncio.new_event_loop()
+        self._synth_limit = None
+        self._pending_synth = {}
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            daemon=True,
+            name="IrisTTS-Loop"
+        )
+        self._loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._warmup(), self._loop)
+        
         self.processing_thread = threading.Thread(
             target=self._process_queue,
             daemon=True,
@@ -520,23 +778,32 @@ class TTSEngine:
         
         self.flush()  # Очищаем и прерываем
         self.is_running = False
+        self._wake.set()
+
+        # Ожидаемый обработчиком синтез уже снят с _prefetched - отменяем отдельно,
+        # иначе после остановки loop его future не завершится никогда
+        current = self._current_synth
+        if current is not None:
+            current.cancel()
 
         if self.processing_thread and self.processing_thread.is_alive():
             self.processing_thread.join(timeout=2.0)
 
+        self._cancel_prefetch()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._loop_thread:
+                self._loop_thread.join(timeout=2.0)
+            if not self._loop.is_running():
+                self._loop.close()
+            self._loop = None
+
         try:
-            pygame.mixer.music.stop()
+            if self._channel is not None:
+                self._channel.stop()
         except:
             pass
 
-        for tmp_file in self.temp_files:
-            try:
-                if os.path.exists(tmp_file):
-                    os.unlink(tmp_file)
-            except:
-                pass
-
-        self.temp_files.clear()
         print("[TTS] Движок остановлен")
 
     def change_voice(self, voice_name: str):
@@ -554,10 +821,10 @@ class TTSEngine:
 
     def get_queue_size(self) -> int:
         """Получить текущий размер очереди"""
-        return self.message_queue.qsize()
+        return len(self._high) + len(self._low)
 
     def set_max_queue_size(self, size: int):
-        """Изменить максимальный размер очереди (требует пересоздания)"""
+        """Изменить максимальный размер очереди (действует для следующих сообщений)"""
         self.max_queue_size = size
         print(f"[TTS] Max queue size изменён на {size}")
 
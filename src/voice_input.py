@@ -14,9 +14,14 @@ import os
 import sys
 import threading
 import time
-import queue
 import json
 import logging
+import math
+import queue
+import re
+import string
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Callable, List, Dict, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -66,6 +71,42 @@ except Exception:
     SOUNDDEVICE_AVAILABLE = False
     logger.info("⚠️ SoundDevice пропущен (требует PortAudio)")
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.info("⚠️ NumPy не импортирован, энергетический гейт для Vosk отключён. pip install numpy")
+
+# Fast parser for Vosk results and stats writer (C extension); stdlib as fallback.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError
+try:
+    import orjson as _json
+
+    def _dumps_pretty(obj) -> bytes:
+        return _json.dumps(obj, option=_json.OPT_INDENT_2 | _json.OPT_NON_STR_KEYS)
+except ImportError:
+    _json = json
+
+    def _dumps_pretty(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# WebRTC VAD: speech/non-speech per 10-30ms frame; energy gate as fallback
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
 # Constants
 WAKEWORD_VARIANTS = ['ирис', 'iris', 'айрис', 'ирус', 'ириш', 'ai iris']
 
@@ -84,22 +125,156 @@ QUICK_COMMANDS = {
     'статус': 'stats',
 }
 
+
+def _build_wake_automaton():
+    """Aho-Corasick automaton over wake word variants: variant -> (rank, variant)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for rank, variant in enumerate(WAKEWORD_VARIANTS):
+        automaton.add_word(variant, (rank, variant))
+    automaton.make_automaton()
+    return automaton
+
+
+_WAKE_AUTOMATON = _build_wake_automaton()
+
+# Fallback without pyahocorasick: one alternation; the lookahead reports a match
+# at every position, alternatives are ordered by rank
+_WAKE_RE = re.compile('(?=(' + '|'.join(map(re.escape, WAKEWORD_VARIANTS)) + '))')
+_WAKE_RANK = {variant: rank for rank, variant in enumerate(WAKEWORD_VARIANTS)}
+
+# Fuzzy match: a word starting with the first 4 letters of a variant
+_WAKE_PREFIX_RE = re.compile(
+    r'(?<!\S)(?:' + '|'.join(re.escape(v[:4]) for v in WAKEWORD_VARIANTS
+                            if len(v) >= 4 and ' ' not in v[:4]) + r')\S*'
+)
+
+# All quick command keys in one alternation (same lookahead trick as _WAKE_RE)
+_QUICK_CMD_RE = re.compile('(?=(' + '|'.join(map(re.escape, QUICK_COMMANDS)) + '))')
+_QUICK_CMD_RANK = {key: rank for rank, key in enumerate(QUICK_COMMANDS)}
+
+
+def _best_ranked_match(pattern: re.Pattern, ranks: Dict[str, int], text: str) -> Optional[Tuple[int, str]]:
+    """
+    Scan text once with a lookahead alternation
+    Returns: (index, key) for the first occurrence of the lowest-ranked key, or None
+    """
+    best = None
+    for match in pattern.finditer(text):
+        key = match.group(1)
+        rank = ranks[key]
+        if best is None or rank < best[0]:
+            best = (rank, match.start(), key)
+            if rank == 0:
+                break
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+# Smaller/quantized Russian models, tried first when prefer_quantized=True
+QUANTIZED_MODEL_PATHS = [
+    'models/vosk-model-small-ru-0.22',
+    'vosk-model-small-ru-0.22',
+    'vosk-model-ru-0.22-int8',
+    'models/vosk-model-ru-0.22-quant',
+]
+
+# PCM energy for the Vosk gate
+if NUMPY_AVAILABLE and njit is not None:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _chunk_rms(x):
+        """RMS of an int16 chunk"""
+        n = x.shape[0]
+        if n == 0:
+            return 0.0
+        s = 0.0
+        for i in range(n):
+            v = float(x[i])
+            s += v * v
+        return (s / n) ** 0.5
+elif NUMPY_AVAILABLE:
+    def _chunk_rms(x):
+        """RMS of an int16 chunk (without numba)"""
+        if x.shape[0] == 0:
+            return 0.0
+        xf = x.astype(np.float64)
+        return (float(np.dot(xf, xf)) / x.shape[0]) ** 0.5
+
+
+# Removes everything a "pure number" phrase may consist of (digits, dots, dashes, spaces)
+_NUMBER_STRIP_TABLE = str.maketrans('', '', string.digits + '.-' + string.whitespace)
+
+def _strip_unk(text: str) -> str:
+    """Drop '[unk]' tokens the wake grammar recognizer emits for other words"""
+    text = text.strip()
+    if '[unk]' in text:
+        text = ' '.join(word for word in text.split() if word != '[unk]')
+    return text
+
+
+def _existing_paths(paths: List[Optional[str]]):
+    """
+    Yield the paths that exist, in order; each parent directory is listed
+    with one os.scandir instead of a stat per candidate
+    """
+    listed: Dict[str, frozenset] = {}
+    for path in paths:
+        if not path:
+            continue
+        parent, name = os.path.split(os.path.normpath(path))
+        if name in ('', os.curdir, os.pardir):  # root, '.', '..' are not directory entries
+            if os.path.exists(path):
+                yield path
+            continue
+        parent = parent or os.curdir
+        if parent not in listed:
+            try:
+                with os.scandir(parent) as entries:
+                    listed[parent] = frozenset(os.path.normcase(e.name) for e in entries)
+            except OSError:
+                listed[parent] = frozenset()
+        if os.path.normcase(name) in listed[parent]:
+            yield path
+
+
 # Sentence ending markers
 SENTENCE_ENDINGS = ['.', '!', '?', '...']
 PAUSE_THRESHOLD = 1.5  # 1.5 сек паузы = конец фразы
-
-@dataclass
+AUDIO_BUFFER_CHUNKS = 50  # ~5s PCM при chunk_size=1600
+GATE_HANGOVER_CHUNKS = 8  # чанков (~0.8s) после громкого, которые ещё идут в Vosk
+GATE_NOISE_RATIO = 3.0    # порог гейта = шум * 3 (~+10 dB), но не выше energy_threshold
+GATE_NOISE_ALPHA = 0.05   # скорость EMA уровня шума
+GATE_MIN_RMS = 150.0      # ниже этого порог не опускается
+VAD_AGGRESSIVENESS = 2    # 0 (мягкий) .. 3 (строгий)
+VAD_FRAME_MS = 20         # кадр WebRTC VAD: 10, 20 или 30 мс
+VAD_MIN_SPEECH_FRAMES = 2 # столько речевых кадров в чанке открывают гейт (щелчки не проходят)
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+
+@dataclass(slots=True)
 class RecognitionStats:
     """Statistics for voice recognition"""
     total_phrases: int = 0
     wake_detected: int = 0
     vosk_success: int = 0
     google_success: int = 0
-    avg_confidence: float = 0.0
     last_recognition: str = ""
     audio_quality: float = 0.0
+    conf_sum: float = 0.0  # running sum/count behind avg_confidence
+    conf_count: int = 0
+
+    @property
+    def avg_confidence(self) -> float:
+        """Mean word confidence (computed only when asked)"""
+        return self.conf_sum / self.conf_count if self.conf_count else 0.0
 
-@dataclass
+    def add_confidence(self, conf: float):
+        """Account one recognized word's confidence"""
+        self.conf_sum += conf
+        self.conf_count += 1
+
+@dataclass(slots=True)
 class AudioSettings:
     """Audio configuration"""
     sample_rate: int = 16000
@@ -132,7 +307,8 @@ class VoiceInput:
         sample_rate: int = 16000,
         enable_analytics: bool = True,
         conversation_timeout: float = 30.0,
-        tts_interrupt_callback: Optional[Callable[[], None]] = None
+        tts_interrupt_callback: Optional[Callable[[], None]] = None,
+        prefer_quantized: bool = True
     ):
         """Initialize VoiceInput system"""
 
@@ -142,6 +318,9 @@ class VoiceInput:
 
         # Core settings
         self.wake_word = wake_word.lower()
+        # Letter-overlap wake match: wake word letters and how many must be shared
+        self._wake_chars = frozenset(self.wake_word)
+        self._wake_overlap_threshold = math.ceil(len(self._wake_chars) * 0.7)
         self.sensitivity = max(0.1, min(1.0, sensitivity))
         self.mode = mode
         self.audio_device_index = audio_device_index
@@ -149,6 +328,8 @@ class VoiceInput:
         self.enable_analytics = enable_analytics
         self.conversation_timeout = conversation_timeout
         self.tts_interrupt_callback = tts_interrupt_callback
+        self.prefer_quantized = prefer_quantized
+        self.wake_char_overlap = True  # loose last-resort wake match by shared letters
 
         # Audio settings
         self.audio_settings = AudioSettings(
@@ -165,7 +346,8 @@ class VoiceInput:
 
         # Timeouts
         self.activation_timeout = conversation_timeout
-        self.last_activation_time = 0
+        self.last_activation_time = 0  # time.monotonic()
+        self._activation_deadline = 0.0  # last_activation_time + activation_timeout
         self.last_audio_time = 0
         self.last_speech_time = 0
         self.last_phrase_text = ""
@@ -176,20 +358,58 @@ class VoiceInput:
         # ✅ FIXED: last_vosk_result_time ОБНОВЛЯЕТСЯ НА КАЖДОМ РЕЗУЛЬТАТЕ!
         self.last_vosk_result_time = 0  # Время последнего результата от Vosk (final или partial)
         self.phrase_finalization_timeout = 1.5  # 1.5s паузы = конец фразы
-
-        # Command queue and history
-        self.command_queue = queue.PriorityQueue()
-        self.audio_buffer = queue.Queue()
+        self._speech_event = threading.Event()  # set on every result - restarts the pause timer
+
+        # Speech gate before Vosk: silent chunks are not decoded while waiting for the wake word
+        self._gate_hold = 0
+        self._gated_chunk: Optional[bytes] = None
+        self._noise_rms: Optional[float] = None  # EMA of RMS over gated (silent) chunks
+
+        # WebRTC VAD decides instead of RMS when installed (mono 16-bit PCM only)
+        self._vad = None
+        self._vad_frame_bytes = 0
+        if (webrtcvad is not None and self.audio_settings.channels == 1
+                and self.audio_settings.sample_rate in VAD_SAMPLE_RATES):
+            self._vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+            self._vad_frame_bytes = self.audio_settings.sample_rate * VAD_FRAME_MS // 1000 * 2
+
+        # Last PartialResult() string and its parsed outcome: Vosk repeats it between words
+        self._last_partial_json = ''
+        self._last_partial_result: Tuple[Optional[str], bool] = (None, False)
+
+        # Command queue and PCM buffer: one producer, one consumer each -
+        # deque append/popleft are atomic, no Queue locks needed.
+        # Bounded buffer drops the oldest PCM instead of blocking the capture side
+        self.command_queue: deque = deque()
+        self.audio_buffer: deque = deque(maxlen=AUDIO_BUFFER_CHUNKS)
+        self._audio_event = threading.Event()  # set by the capture callback on new PCM
 
         # Callbacks
         self.command_callback: Optional[Callable[[str], None]] = None
         self.wake_callback: Optional[Callable[[], None]] = None
         self.error_callback: Optional[Callable[[Exception], None]] = None
 
+        # Callback workers (created in start()): the recognition thread never waits
+        # for AI generation or TTS. Wake/command callbacks share one worker to keep
+        # their order; TTS interrupt has its own so it is never queued behind a command
+        self._cb_pool: Optional[ThreadPoolExecutor] = None
+        self._interrupt_pool: Optional[ThreadPoolExecutor] = None
+        self._interrupt_future: Optional[Future] = None
+
         # Recognition history
-        self.recognition_history: List[Dict[str, Any]] = []
-        self.max_history = 100
+        self.max_history = 50  # only the tail that save_stats writes out is kept
+        self.recognition_history: deque = deque(maxlen=self.max_history)  # oldest drop off in O(1)
         self.stats = RecognitionStats()
+        self._stats_view: Dict[str, Any] = dict.fromkeys((  # filled by get_recognition_stats
+            'total_phrases', 'wake_detected', 'vosk_success', 'google_success',
+            'avg_confidence', 'last_recognition', 'audio_quality', 'queue_size',
+            'conversation_active', 'conversation_timeout_remaining',
+        ))
+
+        # save_stats only snapshots; file writes happen on a flusher thread
+        # so a slow disk never stalls the recognition thread
+        self._flush_q: queue.Queue = queue.Queue(maxsize=4)
+        threading.Thread(target=self._stats_flusher_loop, daemon=True, name='VoiceInput-StatsFlusher').start()
 
         # Duplicate command prevention
         self.last_command = ""
@@ -199,12 +419,20 @@ class VoiceInput:
         # Vosk setup
         self.vosk_model = None
         self.vosk_recognizer = None
+        self._wake_recognizer = None  # grammar-constrained to wake variants
+        self._active_recognizer = None
         self._init_vosk(vosk_model_path)
+        self._warmup_thread: Optional[threading.Thread] = None  # see create_voice_input
 
         # Google Speech Recognition setup
         self.sr_recognizer = None
         self._init_google_speech()
 
+        # SpeechRecognition microphone: opened once and shared by the Google loop and
+        # calibrate_microphone; a PortAudio stream has a single reader, hence the lock
+        self._mic_source = None
+        self._mic_lock = threading.Lock()
+
         # Audio device setup
         self.audio_stream = None
         self.pyaudio_instance = None
@@ -232,27 +460,73 @@ class VoiceInput:
             logger.warning("[VOICE] Vosk недоступен")
             return
 
-        model_paths = [
-            model_path,
+        model_paths = [model_path]
+        if self.prefer_quantized:
+            # Small/quantized models: several times less memory and faster AcceptWaveform
+            model_paths += QUANTIZED_MODEL_PATHS
+        model_paths += [
             'models/vosk-model-ru-0.22',
             'vosk-model-ru-0.22',
             os.path.expanduser('~/.vosk/vosk-model-ru-0.22'),
             '/usr/share/vosk/vosk-model-ru-0.22',
         ]
 
-        for path in model_paths:
-            if path and os.path.exists(path):
-                try:
-                    self.vosk_model = Model(path)
-                    self.vosk_recognizer = KaldiRecognizer(self.vosk_model, self.sample_rate)
-                    self.vosk_recognizer.SetWords(True)
-                    logger.info(f"[VOICE] ✅ Модель Vosk загружена: {path}")
-                    return
-                except Exception as e:
-                    logger.error(f"[VOICE] Ошибка загрузки Vosk: {e}")
+        for path in _existing_paths(model_paths):
+            try:
+                self.vosk_model = Model(path)
+                self.vosk_recognizer = KaldiRecognizer(self.vosk_model, self.sample_rate)
+                self.vosk_recognizer.SetWords(True)
+                logger.info(f"[VOICE] ✅ Модель Vosk загружена: {path}")
+                self._log_model_conf(path)
+                self._init_wake_recognizer()
+                return
+            except Exception as e:
+                logger.error(f"[VOICE] Ошибка загрузки Vosk: {e}")
 
         logger.warning("[VOICE] Vosk модель не найдена")
 
+    def _init_wake_recognizer(self):
+        """
+        Recognizer limited to the wake variants: while waiting for the wake word the
+        decoder searches a handful of words instead of the whole lexicon.
+        Models with a static graph (e.g. vosk-model-ru-0.22) ignore the grammar - still correct
+        """
+        try:
+            grammar = json.dumps(WAKEWORD_VARIANTS + ['[unk]'], ensure_ascii=False)
+            self._wake_recognizer = KaldiRecognizer(self.vosk_model, self.sample_rate, grammar)
+        except Exception as e:
+            logger.warning(f"[VOICE] Wake-грамматика недоступна: {e}")
+            self._wake_recognizer = None
+
+    def _warm_models(self):
+        """
+        Pay the one-off costs before the first utterance: the first Vosk decode
+        and the numba compile of the gate's RMS kernel
+        """
+        started = time.monotonic()
+        try:
+            if NUMPY_AVAILABLE:
+                _chunk_rms(np.zeros(self.audio_settings.chunk_size, dtype=np.int16))
+
+            silence = b'\x00' * (self.audio_settings.chunk_size * 2)
+            for rec in (self._wake_recognizer, self.vosk_recognizer):
+                if rec is not None:
+                    rec.AcceptWaveform(silence)
+                    rec.Reset()
+
+            logger.info(f"[VOICE] 🔥 Прогрев завершён за {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            logger.warning(f"[VOICE] Ошибка прогрева: {e}")
+
+    def _log_model_conf(self, path: str):
+        """Log decoder options from the model's conf/model.conf (if present)"""
+        try:
+            with open(os.path.join(path, 'conf', 'model.conf'), encoding='utf-8') as f:
+                options = [line.strip() for line in f if line.startswith('--')]
+        except OSError:
+            return
+        logger.info(f"[VOICE] model.conf: {' '.join(options)}")
+
     def _init_google_speech(self):
         """Initialize Google Speech Recognition"""
         if not SR_AVAILABLE:
@@ -315,41 +589,60 @@ class VoiceInput:
         if not text or len(text.strip()) < 2:
             return False, text
 
-        text_lower = text.lower().strip()
-        words = text_lower.split()
+        return self._check_wakeword_normalized(text.lower().strip())
 
-        # Method 1: Exact substring match
-        for variant in WAKEWORD_VARIANTS:
-            if variant in text_lower:
-                logger.debug(f"[VOICE] Wake word variant found: {variant}")
-                return True, text_lower.replace(variant, '', 1).strip()
+    def _check_wakeword_normalized(self, text_lower: str) -> Tuple[bool, str]:
+        """
+        check_wakeword for text that is already stripped and lowercased
+        (the recognition path normalizes once and passes it down)
+        """
+        # Method 1: Exact substring match (single scan, highest-ranked variant wins;
+        # this also covers a variant at the start of the text)
+        found = self._find_wake_variant(text_lower)
+        if found is not None:
+            idx, variant = found
+            logger.debug(f"[VOICE] Wake word variant found: {variant}")
+            return True, self._splice_out(text_lower, idx, len(variant)).strip()
 
         # Method 2: Fuzzy matching
-        for word in words:
-            if len(word) >= 4:
-                for variant in WAKEWORD_VARIANTS:
-                    if word.startswith(variant[:4]) and len(variant) >= 4:
-                        logger.debug(f"[VOICE] Wake word fuzzy match: {word} ~= {variant}")
-                        return True, text_lower.replace(word, '', 1).strip()
-
-        # Method 3: Prefix matching
-        for variant in WAKEWORD_VARIANTS:
-            if text_lower.startswith(variant):
-                logger.debug(f"[VOICE] Wake word prefix match: {variant}")
-                return True, text_lower[len(variant):].strip()
-
-        # Method 4: Character overlap
-        wake_chars = set(self.wake_word)
-        for word in words:
+        match = _WAKE_PREFIX_RE.search(text_lower)
+        if match:
+            logger.debug(f"[VOICE] Wake word fuzzy match: {match.group()}")
+            return True, self._splice_out(text_lower, match.start(), len(match.group())).strip()
+
+        if not self.wake_char_overlap:
+            return False, text_lower
+
+        # Method 3: Character overlap
+        for word in text_lower.split():
             if len(word) >= 3:
-                word_chars = set(word)
-                overlap = len(wake_chars & word_chars)
-                if overlap >= len(wake_chars) * 0.7:
+                if len(self._wake_chars.intersection(word)) >= self._wake_overlap_threshold:
                     logger.debug(f"[VOICE] Wake word fuzzy overlap: {word}")
-                    return True, text_lower.replace(word, '', 1).strip()
+                    return True, self._splice_out(text_lower, text_lower.find(word), len(word)).strip()
 
         return False, text_lower
 
+    @staticmethod
+    def _splice_out(text: str, idx: int, length: int) -> str:
+        """text without text[idx:idx + length] (no rescan, unlike str.replace)"""
+        return text[:idx] + text[idx + length:]
+
+    @staticmethod
+    def _find_wake_variant(text_lower: str) -> Optional[Tuple[int, str]]:
+        """First occurrence of the highest-ranked wake variant: (index, variant) or None"""
+        if _WAKE_AUTOMATON is None:
+            return _best_ranked_match(_WAKE_RE, _WAKE_RANK, text_lower)
+
+        best = None
+        for end, (rank, variant) in _WAKE_AUTOMATON.iter(text_lower):
+            if best is None or rank < best[0]:
+                best = (rank, end - len(variant) + 1, variant)
+                if rank == 0:
+                    break
+        if best is None:
+            return None
+        return best[1], best[2]
+
     def extract_command(self, text: str) -> str:
         """Extract and clean command from text"""
         if not text:
@@ -357,13 +650,15 @@ class VoiceInput:
 
         text_lower = text.lower().strip()
 
-        # Check for quick commands
-        for cmd_key, cmd_value in QUICK_COMMANDS.items():
-            if cmd_key in text_lower:
-                return cmd_value
+        # Check for quick commands (one scan; earlier keys in QUICK_COMMANDS win)
+        found = _best_ranked_match(_QUICK_CMD_RE, _QUICK_CMD_RANK, text_lower)
+        if found is not None:
+            return QUICK_COMMANDS[found[1]]
 
         # Remove wake word if present
-        is_wake, cleaned = self.check_wakeword(text_lower)
+        if len(text_lower) < 2:
+            return text_lower
+        is_wake, cleaned = self._check_wakeword_normalized(text_lower)
         if is_wake:
             return cleaned
 
@@ -392,34 +687,36 @@ class VoiceInput:
         ✅ ОБРАБОТИТЬ РАСПОЗНАННЫЙ ТЕКСТ
         Когда is_final=True → вызывается command_callback
         """
-        if not text or len(text.strip()) < 2:
+        if not text:
+            return
+
+        # Normalize once; everything below works on the stripped lowercase text
+        text = text.strip().lower()
+        if len(text) < 2:
             return
 
         # 🎙️ ОБНОВЛЯЕМ ТАЙМЕР И last_vosk_result_time
-        current_time = time.time()
+        # Timeouts are measured on the monotonic clock, taken once per result
+        current_time = time.monotonic()
         self.last_speech_time = current_time
         self.last_vosk_result_time = current_time  # ✅ ОБНОВЛЯЕТСЯ НА КАЖДОМ РЕЗУЛЬТАТЕ!
+        self._speech_event.set()
 
         # Если в режиме беседы - обновляем activation_timeout!
         if self.conversation_active:
             self.last_activation_time = current_time
+            self._activation_deadline = current_time + self.activation_timeout
             logger.debug(f"[VOICE] ⏱️ Таймер обновлён: {self.conversation_timeout}s")
 
         # 🎙️ Если пользователь говорит - прерываем TTS!
-        if self.tts_interrupt_callback:
-            try:
-                logger.info("[VOICE] 🔇 Прерываю TTS (пользователь начал говорить)")
-                self.tts_interrupt_callback()
-            except Exception as e:
-                logger.error(f"[VOICE] Ошибка TTS interrupt: {e}")
+        # (пока предыдущее прерывание не отработало, новое не ставим)
+        if self.tts_interrupt_callback and (self._interrupt_future is None or self._interrupt_future.done()):
+            logger.info("[VOICE] 🔇 Прерываю TTS (пользователь начал говорить)")
+            self._interrupt_future = self._dispatch(self._interrupt_pool, self._run_interrupt_callback)
 
         # Filter pure numbers
-        text_clean = text.strip()
-        parts = text_clean.split()
-        all_numbers = all(all(c.isdigit() or c == '.' or c == '-' for c in part) for part in parts)
-
-        if all_numbers and len(parts) > 0:
-            logger.debug(f"[VOICE] Пропущена числовая последовательность: {text_clean}")
+        if not text.translate(_NUMBER_STRIP_TABLE):
+            logger.debug(f"[VOICE] Пропущена числовая последовательность: {text}")
             return
 
         # Update statistics
@@ -429,17 +726,14 @@ class VoiceInput:
         # Store in history
         self.recognition_history.append({
             'text': text,
-            'timestamp': current_time,
+            'timestamp': time.time(),  # wall clock for saved stats
             'is_final': is_final
         })
 
-        if len(self.recognition_history) > self.max_history:
-            self.recognition_history.pop(0)
-
         logger.info(f"🌐 [VOICE] Распознано: '{text}' (final={is_final})")
 
         # Check for wake word
-        is_wake, cleaned_text = self.check_wakeword(text)
+        is_wake, cleaned_text = self._check_wakeword_normalized(text)
 
         if is_wake:
             # ═════════════════════════════════════════════════════════
@@ -457,21 +751,18 @@ class VoiceInput:
             self.is_active = True
             self.conversation_active = True
             self.last_activation_time = current_time
+            self._activation_deadline = current_time + self.activation_timeout
             self.last_speech_time = current_time
             self.current_partial_phrase = cleaned_text
+            self._speech_event.set()  # pause detector switches from idle wait to the pause timer
 
             # Call wake callback
             if self.wake_callback:
-                try:
-                    self.wake_callback()
-                except Exception as e:
-                    logger.error(f"[VOICE] Ошибка wake callback: {e}")
-                    if self.error_callback:
-                        self.error_callback(e)
+                self._dispatch(self._cb_pool, self._run_wake_callback)
 
             # Если есть текст после wake word - обработай его как команду
             if cleaned_text and len(cleaned_text.strip()) > 2:
-                self.handle_command(cleaned_text)
+                self._handle_normalized(cleaned_text, current_time)
 
         elif self.conversation_active:
             # ═════════════════════════════════════════════════════════
@@ -490,31 +781,33 @@ class VoiceInput:
                 logger.info(f"[VOICE] 📝 Полная фраза: '{text}' (is_final=True)")
 
                 # ✅ ВЫЗЫВАЕМ HANDLE_COMMAND
-                self.handle_command(text)
+                self._handle_normalized(text, current_time)
 
             else:
                 # Still waiting for more input
                 logger.debug(f"[VOICE] ⏳ Неполная фраза: '{text}' (жду продолжение...)")
 
-    def handle_command(self, command: str):
+    def handle_command(self, command: str, ts: Optional[float] = None):
         """
         ✅ ОБРАБОТКА КОМАНДЫ - Здесь вызывается command_callback!
+        ts: time.monotonic() of the recognition result (taken here if not given)
         """
         if not command:
             return
 
-        # Clean command
-        clean_command = command.strip().lower()
+        self._handle_normalized(command.strip().lower(), ts)
 
+    def _handle_normalized(self, clean_command: str, ts: Optional[float] = None):
+        """handle_command for a command that is already stripped and lowercased"""
         # Remove wake word if still present
         if clean_command.startswith(self.wake_word):
             clean_command = clean_command[len(self.wake_word):].strip()
 
-        if not clean_command or len(clean_command.strip()) < 2:
+        if not clean_command or len(clean_command) < 2:
             return
 
         # Check for duplicate commands
-        current_time = time.time()
+        current_time = ts if ts is not None else time.monotonic()
         if self.last_command == clean_command and current_time - self.last_command_time < self.duplicate_timeout:
             logger.debug(f"[VOICE] Дубль команды, пропускаем: {clean_command}")
             return
@@ -529,48 +822,80 @@ class VoiceInput:
         # Mark as processing
         self.is_processing_command = True
 
-        # ✅ ВЫЗЫВАЕМ COMMAND CALLBACK
+        # ✅ ВЫЗЫВАЕМ COMMAND CALLBACK (в потоке-обработчике, не в потоке распознавания)
         if self.command_callback:
-            try:
-                logger.info(f"[VOICE] 📤 Вызываю command_callback с: '{clean_command}'")
-                self.command_callback(clean_command)
-                logger.info(f"[VOICE] ✅ Callback выполнен для: '{clean_command}'")
-            except Exception as e:
-                logger.error(f"[VOICE] Ошибка command callback: {e}")
-                if self.error_callback:
-                    self.error_callback(e)
+            self._dispatch(self._cb_pool, self._run_command_callback, clean_command)
         else:
             logger.warning(f"[VOICE] ⚠️ Command callback не установлен!")
-
-        self.is_processing_command = False
+            self.is_processing_command = False
 
         # ✅ НЕ ВЫКЛЮЧАЕМ conversation_active!
         # Позволяем пользователю давать несколько команд подряд
 
+    @staticmethod
+    def _dispatch(pool: Optional[ThreadPoolExecutor], fn: Callable, *args) -> Optional[Future]:
+        """Run fn on the callback worker; inline if the system is not started"""
+        if pool is None:
+            fn(*args)
+            return None
+        try:
+            return pool.submit(fn, *args)
+        except RuntimeError:  # pool shut down by stop()
+            return None
+
+    def _run_interrupt_callback(self):
+        """Call tts_interrupt_callback (may block until TTS stops)"""
+        try:
+            self.tts_interrupt_callback()
+        except Exception as e:
+            logger.error(f"[VOICE] Ошибка TTS interrupt: {e}")
+
+    def _run_wake_callback(self):
+        """Call wake_callback"""
+        try:
+            self.wake_callback()
+        except Exception as e:
+            logger.error(f"[VOICE] Ошибка wake callback: {e}")
+            if self.error_callback:
+                self.error_callback(e)
+
+    def _run_command_callback(self, command: str):
+        """Call command_callback (may block for the whole AI generation)"""
+        try:
+            logger.info(f"[VOICE] 📤 Вызываю command_callback с: '{command}'")
+            self.command_callback(command)
+            logger.info(f"[VOICE] ✅ Callback выполнен для: '{command}'")
+        except Exception as e:
+            logger.error(f"[VOICE] Ошибка command callback: {e}")
+            if self.error_callback:
+                self.error_callback(e)
+        finally:
+            self.is_processing_command = False
+
     def _pause_detector_loop(self):
         """⭐ Детектор паузы - вызывает process_recognition с is_final=True когда пауза >= 1.5s"""
         logger.info("[VOICE] ⏸️ Pause detector запущен")
 
         while self.is_listening:
             try:
-                current_time = time.time()
-
-                # Если мы в режиме разговора и был результат Vosk
-                if self.conversation_active and self.last_vosk_result_time > 0:
-                    time_since_last = current_time - self.last_vosk_result_time
-
-                    # Если прошло >= 1.5 сек без результата и есть текущая фраза
-                    if time_since_last >= self.phrase_finalization_timeout and self.current_partial_phrase:
-                        logger.info(f"[VOICE] ⏸️ Пауза обнаружена ({time_since_last:.1f}s) → вызываю is_final=True")
+                # Ждём следующий результат; любой результат перезапускает таймер.
+                # Вне режима разговора завершать нечего - спим без таймаута до события
+                # (результат, активация по wake word или stop()), без пустых пробуждений
+                self._speech_event.clear()
+                timeout = self.phrase_finalization_timeout if self.conversation_active else None
+                if self._speech_event.wait(timeout) or not self.is_listening:
+                    continue
 
-                        # Вызываем process_recognition с is_final=True
-                        self.process_recognition(self.current_partial_phrase, is_final=True)
+                # 1.5 сек без результата: если в режиме разговора есть текущая фраза - завершаем
+                if self.conversation_active and self.last_vosk_result_time > 0 and self.current_partial_phrase:
+                    logger.info(f"[VOICE] ⏸️ Пауза обнаружена ({self.phrase_finalization_timeout:.1f}s) → вызываю is_final=True")
 
-                        # Очищаем буфер
-                        self.current_partial_phrase = ""
-                        self.last_vosk_result_time = 0
+                    # Вызываем process_recognition с is_final=True
+                    self.process_recognition(self.current_partial_phrase, is_final=True)
 
-                time.sleep(0.1)  # Проверяем каждые 100ms
+                    # Очищаем буфер
+                    self.current_partial_phrase = ""
+                    self.last_vosk_result_time = 0
 
             except Exception as e:
                 logger.error(f"[VOICE] Ошибка pause detector: {e}")
@@ -584,13 +909,27 @@ class VoiceInput:
         if not self.vosk_recognizer:
             return None, False
 
+        # Waiting for the wake word - cheap grammar recognizer; in conversation - full one
+        rec = self.vosk_recognizer
+        if not self.conversation_active and self._wake_recognizer is not None:
+            rec = self._wake_recognizer
+        if rec is not self._active_recognizer:
+            rec.Reset()  # drop audio it saw before the previous switch
+            self._active_recognizer = rec
+            self._last_partial_json = ''
+
         try:
-            if self.vosk_recognizer.AcceptWaveform(audio_data):
-                result_json = self.vosk_recognizer.Result()
-                result = json.loads(result_json)
+            if rec.AcceptWaveform(audio_data):
+                result_json = rec.Result()
+                result = _json.loads(result_json)
 
                 text = result.get('result', [])
 
+                if isinstance(text, list):
+                    for item in text:
+                        if isinstance(item, dict) and isinstance(item.get('conf'), (int, float)):
+                            self.stats.add_confidence(item['conf'])
+
                 if text:
                     if isinstance(text, str):
                         if text.strip():
@@ -616,17 +955,21 @@ class VoiceInput:
                             if result_text and len(result_text) > 1:
                                 return result_text, True
 
-                text = result.get('text', '').strip()
+                text = _strip_unk(result.get('text', ''))
                 if text and len(text) > 1:
                     return text, True
 
-            # Check partial result
-            partial_json = self.vosk_recognizer.PartialResult()
-            partial = json.loads(partial_json)
-            text = partial.get('partial', '').strip()
+            # Check partial result (unchanged since last chunk - reuse the parse)
+            partial_json = rec.PartialResult()
+            if partial_json == self._last_partial_json:
+                return self._last_partial_result
 
-            if text and len(text) > 3:
-                return text, False
+            partial = _json.loads(partial_json)
+            text = _strip_unk(partial.get('partial', ''))
+            outcome = (text, False) if text and len(text) > 3 else (None, False)
+            self._last_partial_json = partial_json
+            self._last_partial_result = outcome
+            return outcome
 
         except json.JSONDecodeError:
             pass
@@ -635,6 +978,68 @@ class VoiceInput:
 
         return None, False
 
+    def _pass_speech_gate(self, audio_data: bytes) -> bool:
+        """
+        Should this chunk go to Vosk?
+        Speech is detected by WebRTC VAD if installed, otherwise by RMS against an
+        adaptive threshold: GATE_NOISE_RATIO above the noise floor, capped by
+        energy_threshold (same measure as SpeechRecognition);
+        the gate stays open for GATE_HANGOVER_CHUNKS after speech and always in conversation
+        """
+        if self.conversation_active:
+            self._gate_hold = 0
+            return True
+
+        if self._vad is not None:
+            speech = self._vad_is_speech(audio_data)
+        elif NUMPY_AVAILABLE:
+            speech = self._energy_is_speech(audio_data)
+        else:
+            return True
+
+        if speech:
+            self._gate_hold = GATE_HANGOVER_CHUNKS
+            return True
+
+        if self._gate_hold > 0:
+            self._gate_hold -= 1
+            return True
+        return False
+
+    def _vad_is_speech(self, audio_data: bytes) -> bool:
+        """At least VAD_MIN_SPEECH_FRAMES speech frames in the chunk (trailing partial frame ignored)"""
+        step = self._vad_frame_bytes
+        rate = self.audio_settings.sample_rate
+        is_speech = self._vad.is_speech
+        view = memoryview(audio_data)
+        frames = len(view) // step
+        if not frames:  # chunk shorter than a VAD frame - cannot judge, let it through
+            return True
+        needed = min(VAD_MIN_SPEECH_FRAMES, frames)
+        found = 0
+        for i in range(0, frames * step, step):
+            if is_speech(view[i:i + step], rate):
+                found += 1
+                if found >= needed:
+                    return True
+        return False
+
+    def _energy_is_speech(self, audio_data: bytes) -> bool:
+        """RMS above the adaptive threshold; quiet chunks update the noise floor"""
+        energy = _chunk_rms(np.frombuffer(audio_data, dtype=np.int16))
+        threshold = self.audio_settings.energy_threshold
+        if self._noise_rms is not None:
+            threshold = min(threshold, max(self._noise_rms * GATE_NOISE_RATIO, GATE_MIN_RMS))
+
+        if energy >= threshold:
+            return True
+
+        if self._noise_rms is None:
+            self._noise_rms = energy
+        else:
+            self._noise_rms += GATE_NOISE_ALPHA * (energy - self._noise_rms)
+        return False
+
     def recognize_with_google(self, audio_data) -> Optional[str]:
         """Recognize speech using Google Speech Recognition (online fallback)"""
         if not self.sr_recognizer:
@@ -664,38 +1069,64 @@ class VoiceInput:
             self.listen_loop_google()
             return
 
+        # Recognizers are not thread-safe: let a running warm-up finish first
+        if self._warmup_thread is not None:
+            self._warmup_thread.join()
+
         try:
-            p = pyaudio.PyAudio()
+            # One PortAudio instance per VoiceInput (created in _init_audio_device)
+            if self.pyaudio_instance is None:
+                self.pyaudio_instance = pyaudio.PyAudio()
+            p = self.pyaudio_instance
 
             try:
+                # Callback mode: PortAudio captures on its own thread into audio_buffer,
+                # so a slow AcceptWaveform no longer makes the device drop frames
+                self.audio_buffer.clear()
                 self.audio_stream = p.open(
                     format=pyaudio.paInt16,
                     channels=self.audio_settings.channels,
                     rate=self.audio_settings.sample_rate,
                     input=True,
                     input_device_index=self.audio_device_index,
-                    frames_per_buffer=self.audio_settings.chunk_size
+                    frames_per_buffer=self.audio_settings.chunk_size,
+                    stream_callback=self._on_audio
                 )
 
                 logger.info("[VOICE] ✅ Аудиопоток открыт, начинаем слушать...")
 
+                # Hoisted out of the per-chunk loop
+                pop_chunk = self.audio_buffer.popleft
+                audio_event = self._audio_event
+                pass_gate = self._pass_speech_gate
+                recognize = self.recognize_with_vosk
+                check_timeout = self._check_conversation_timeout
+
                 while self.is_listening:
                     try:
-                        audio_data = self.audio_stream.read(self.audio_settings.chunk_size, exception_on_overflow=False)
-
-                        # Recognize with Vosk
-                        text, is_final = self.recognize_with_vosk(audio_data)
-
-                        if text:
-                            self.process_recognition(text, is_final=is_final)
-
-                        # Check conversation timeout
-                        if self.conversation_active:
-                            elapsed = time.time() - self.last_activation_time
-                            if elapsed > self.activation_timeout:
-                                logger.info(f"[VOICE] ⏱️ Таймаут беседы ({self.activation_timeout}s), выключаюсь")
-                                self.conversation_active = False
-                                self.is_active = False
+                        try:
+                            audio_data = pop_chunk()
+                        except IndexError:
+                            audio_event.clear()
+                            if not self.audio_buffer:  # a chunk may have arrived before clear()
+                                audio_event.wait(0.05)
+                            continue
+
+                        if pass_gate(audio_data):
+                            # Quiet onset of the word sits in the last skipped chunk
+                            if self._gated_chunk is not None:
+                                audio_data = self._gated_chunk + audio_data
+                                self._gated_chunk = None
+
+                            # Recognize with Vosk
+                            text, is_final = recognize(audio_data)
+
+                            if text:
+                                self.process_recognition(text, is_final=is_final)
+                        else:
+                            self._gated_chunk = audio_data
+
+                        check_timeout()
 
                     except Exception as e:
                         logger.error(f"[VOICE] Ошибка в Vosk loop: {e}")
@@ -715,6 +1146,19 @@ class VoiceInput:
             logger.error(f"[VOICE] Ошибка Vosk loop: {e}")
             self.fallback_to_google()
 
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """PyAudio capture callback (PortAudio thread): hand PCM to the Vosk loop"""
+        self.audio_buffer.append(in_data)
+        self._audio_event.set()
+        return None, pyaudio.paContinue
+
+    def _check_conversation_timeout(self):
+        """End conversation mode after activation_timeout without speech"""
+        if self.conversation_active and time.monotonic() > self._activation_deadline:
+            logger.info(f"[VOICE] ⏱️ Таймаут беседы ({self.activation_timeout}s), выключаюсь")
+            self.conversation_active = False
+            self.is_active = False
+
     def listen_loop_google(self):
         """Google Speech Recognition listening loop (fallback)"""
         print("[VOICE] 🔄 GOOGLE LOOP STARTED")
@@ -725,32 +1169,28 @@ class VoiceInput:
             return
 
         try:
-            with sr.Microphone(device_index=self.audio_device_index, sample_rate=self.audio_settings.sample_rate) as source:
+            with self._mic_lock:
+                source = self._get_microphone()
                 logger.info("[VOICE] Калибровка микрофона на 2 сек...")
-                self.sr_recognizer.adjust_for_ambient_noise(source, duration=2)
-                logger.info(f"[VOICE] Пороговое значение энергии: {self.sr_recognizer.energy_threshold}")
+                self._adjust_for_ambient_noise(source, duration=2)
+            logger.info(f"[VOICE] Пороговое значение энергии: {self.sr_recognizer.energy_threshold}")
 
-                while self.is_listening:
-                    try:
+            while self.is_listening:
+                try:
+                    with self._mic_lock:
                         audio = self.sr_recognizer.listen(source, timeout=10.0)
-                        text = self.recognize_with_google(audio)
+                    text = self.recognize_with_google(audio)
 
-                        if text:
-                            self.process_recognition(text, is_final=True)
+                    if text:
+                        self.process_recognition(text, is_final=True)
 
-                    except sr.WaitTimeoutError:
-                        # Check conversation timeout
-                        if self.conversation_active:
-                            elapsed = time.time() - self.last_activation_time
-                            if elapsed > self.activation_timeout:
-                                logger.info(f"[VOICE] ⏱️ Таймаут беседы ({self.activation_timeout}s), выключаюсь")
-                                self.conversation_active = False
-                                self.is_active = False
-                        continue
+                except sr.WaitTimeoutError:
+                    self._check_conversation_timeout()
+                    continue
 
-                    except Exception as e:
-                        logger.error(f"[VOICE] Ошибка Google loop: {e}")
-                        time.sleep(0.5)
+                except Exception as e:
+                    logger.error(f"[VOICE] Ошибка Google loop: {e}")
+                    time.sleep(0.5)
 
         except OSError as e:
             logger.error(f"[VOICE] Ошибка микрофона: {e}")
@@ -761,8 +1201,40 @@ class VoiceInput:
             self.fallback_to_simple()
 
         finally:
+            self._close_microphone()
             logger.info("[VOICE] Google loop остановлен")
 
+    def _adjust_for_ambient_noise(self, source, duration: float):
+        """
+        Set sr_recognizer.energy_threshold from ambient noise: one stream read and
+        one RMS pass over the PCM instead of SpeechRecognition's per-buffer loop.
+        Same target as SR (noise RMS * dynamic_energy_ratio), floored at GATE_MIN_RMS
+        """
+        if not NUMPY_AVAILABLE or source.SAMPLE_WIDTH != 2:
+            self.sr_recognizer.adjust_for_ambient_noise(source, duration=duration)
+            return
+
+        raw = source.stream.read(int(source.SAMPLE_RATE * duration))
+        energy = _chunk_rms(np.frombuffer(raw, dtype='<i2'))
+        self.sr_recognizer.energy_threshold = max(energy * self.sr_recognizer.dynamic_energy_ratio, GATE_MIN_RMS)
+
+    def _get_microphone(self):
+        """Open the SpeechRecognition microphone once and keep it (call with _mic_lock held)"""
+        if self._mic_source is None:
+            mic = sr.Microphone(device_index=self.audio_device_index, sample_rate=self.audio_settings.sample_rate)
+            self._mic_source = mic.__enter__()
+        return self._mic_source
+
+    def _close_microphone(self):
+        """Close the shared microphone stream, if open"""
+        with self._mic_lock:
+            source, self._mic_source = self._mic_source, None
+            if source is not None:
+                try:
+                    source.__exit__(None, None, None)
+                except Exception as e:
+                    logger.error(f"[VOICE] Ошибка закрытия микрофона: {e}")
+
     def listen_loop_simple(self):
         """Simple input loop for testing"""
         print("[VOICE] 📝 SIMPLE LOOP STARTED")
@@ -804,10 +1276,12 @@ class VoiceInput:
 
         try:
             if self.sr_recognizer:
-                with sr.Microphone(device_index=self.audio_device_index) as source:
+                # Same stream as the Google loop (left open for it if not running yet)
+                with self._mic_lock:
+                    source = self._get_microphone()
                     logger.info("[VOICE] Слушаю окружающие звуки на 2 сек...")
-                    self.sr_recognizer.adjust_for_ambient_noise(source, duration=2)
-                    logger.info(f"[VOICE] Новое пороговое значение: {self.sr_recognizer.energy_threshold}")
+                    self._adjust_for_ambient_noise(source, duration=2)
+                logger.info(f"[VOICE] Новое пороговое значение: {self.sr_recognizer.energy_threshold}")
 
         except Exception as e:
             logger.error(f"[VOICE] Ошибка калибровки: {e}")
@@ -839,37 +1313,64 @@ class VoiceInput:
         """Get recognition statistics"""
         remaining_timeout = 0
         if self.conversation_active:
-            remaining_timeout = max(0, self.activation_timeout - (time.time() - self.last_activation_time))
-
-        return {
-            'total_phrases': self.stats.total_phrases,
-            'wake_detected': self.stats.wake_detected,
-            'vosk_success': self.stats.vosk_success,
-            'google_success': self.stats.google_success,
-            'avg_confidence': self.stats.avg_confidence,
-            'last_recognition': self.stats.last_recognition,
-            'audio_quality': self.stats.audio_quality,
-            'queue_size': self.command_queue.qsize(),
-            'conversation_active': self.conversation_active,
-            'conversation_timeout_remaining': remaining_timeout
-        }
+            remaining_timeout = self._activation_deadline - time.monotonic()
+            if remaining_timeout < 0:
+                remaining_timeout = 0.0
+
+        # Values go into the preallocated dict; the caller gets a copy (PyDict_Copy)
+        stats = self.stats
+        view = self._stats_view
+        view['total_phrases'] = stats.total_phrases
+        view['wake_detected'] = stats.wake_detected
+        view['vosk_success'] = stats.vosk_success
+        view['google_success'] = stats.google_success
+        view['avg_confidence'] = stats.avg_confidence
+        view['last_recognition'] = stats.last_recognition
+        view['audio_quality'] = stats.audio_quality
+        view['queue_size'] = len(self.command_queue)
+        view['conversation_active'] = self.conversation_active
+        view['conversation_timeout_remaining'] = remaining_timeout
+        return view.copy()
 
     def save_stats(self, filename: str = 'voice_stats.json'):
-        """Save statistics to file"""
-        try:
-            stats_data = {
-                'timestamp': time.time(),
-                'stats': self.get_recognition_stats(),
-                'history': self.recognition_history[-50:]
-            }
-
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(stats_data, f, indent=2, ensure_ascii=False)
+        """Save statistics to file (written asynchronously by the flusher thread)"""
+        stats_data = {
+            'timestamp': time.time(),
+            'stats': self.get_recognition_stats(),
+            'history': list(self.recognition_history)
+        }
 
-            logger.info(f"[VOICE] Статистика сохранена: {filename}")
+        # Full queue: drop the oldest snapshot - stats are cumulative, the newest wins
+        while True:
+            try:
+                self._flush_q.put_nowait((filename, stats_data))
+                return
+            except queue.Full:
+                try:
+                    self._flush_q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _stats_flusher_loop(self):
+        """Write queued stats snapshots; of several pending for one file only the latest is written"""
+        while True:
+            filename, stats_data = self._flush_q.get()
+            pending = {filename: stats_data}
+            while True:
+                try:
+                    filename, stats_data = self._flush_q.get_nowait()
+                except queue.Empty:
+                    break
+                pending[filename] = stats_data
 
-        except Exception as e:
-            logger.error(f"[VOICE] Ошибка сохранения: {e}")
+            for filename, stats_data in pending.items():
+                try:
+                    # orjson writes UTF-8 (non-ASCII as is) straight to bytes
+                    with open(filename, 'wb') as f:
+                        f.write(_dumps_pretty(stats_data))
+                    logger.info(f"[VOICE] Статистика сохранена: {filename}")
+                except Exception as e:
+                    logger.error(f"[VOICE] Ошибка сохранения: {e}")
 
     def start(self):
         """Start voice input system"""
@@ -878,16 +1379,15 @@ class VoiceInput:
             return
 
         self.is_listening = True
+        self._cb_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='VoiceInput-Callback')
+        self._interrupt_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='VoiceInput-Interrupt')
 
-        # Select listening mode
-        if self.mode == 'vosk':
-            target = self.listen_loop_vosk
-        elif self.mode == 'google':
-            target = self.listen_loop_google
-        elif self.mode == 'simple':
-            target = self.listen_loop_simple
-        else:  # hybrid (default)
-            target = self.listen_loop_vosk
+        # Select listening mode once (hybrid and unknown modes -> Vosk)
+        target = {
+            'vosk': self.listen_loop_vosk,
+            'google': self.listen_loop_google,
+            'simple': self.listen_loop_simple,
+        }.get(self.mode, self.listen_loop_vosk)
 
         # Start listener thread
         self.listener_thread = threading.Thread(
@@ -915,10 +1415,28 @@ class VoiceInput:
         self.is_listening = False
         self.is_active = False
         self.conversation_active = False
+        self._speech_event.set()  # wake the pause detector so it sees is_listening=False
 
         # Wait for thread
         if self.listener_thread and self.listener_thread.is_alive():
             self.listener_thread.join(timeout=2.0)
+        listener_done = not (self.listener_thread and self.listener_thread.is_alive())
+
+        # Microphone left open by calibrate_microphone (the Google loop closes its own)
+        if listener_done:
+            self._close_microphone()
+
+        # Release PortAudio once the listener has closed its stream
+        if self.pyaudio_instance is not None and listener_done:
+            self.pyaudio_instance.terminate()
+            self.pyaudio_instance = None
+
+        # Pending callbacks are dropped; a callback already running finishes on its own
+        for pool in (self._cb_pool, self._interrupt_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._cb_pool = self._interrupt_pool = None
+        self._interrupt_future = None
 
         logger.info("[VOICE] ✅ Прослушивание остановлено")
 
@@ -933,7 +1451,7 @@ def create_voice_input(
     """Factory function to create VoiceInput instance"""
     logger.info(f"[VOICE] Создание VoiceInput: wake_word={wake_word}, mode={mode}, timeout={conversation_timeout}s")
 
-    return VoiceInput(
+    voice_input = VoiceInput(
         wake_word=wake_word,
         sensitivity=sensitivity,
         mode=mode,
@@ -941,3 +1459,13 @@ def create_voice_input(
         tts_interrupt_callback=tts_interrupt_callback,
         **kwargs
     )
+
+    # Warm up in the background so the factory returns right away
+    voice_input._warmup_thread = threading.Thread(
+        target=voice_input._warm_models,
+        daemon=True,
+        name='VoiceInput-Warmup'
+    )
+    voice_input._warmup_thread.start()
+
+    return voice_input